@@ -0,0 +1,95 @@
+import logging
+import sys
+from time import perf_counter
+
+import Dependency
+from clients.gremlin import execute_gremlin_query, get_technologies, gremlin
+
+# usage: python -m benchmarks.classification [library-names-file]
+# without a file, every library name currently in the graph is used as the corpus
+
+
+def loop_padu_ranking(padu, dependency):
+    for tech in padu:
+        for regex in tech["regexes"]:
+            if regex.match(dependency):
+                return tech["name"], tech["ranking"], regex.pattern
+    return "Unknown", "Uncategorized", ""
+
+
+def loop_technology(technologies, dependency):
+    for technology in technologies:
+        for regex in technology["regexes"]:
+            if regex.match(dependency):
+                return technology
+    return None
+
+
+def matcher_padu_ranking(dependency):
+    ranking = Dependency.get_padu_ranking(dependency)
+    return ranking["name"], ranking["ranking"], ranking["matched_regex"]
+
+
+def matcher_technology(dependency):
+    match = Dependency.technology_matcher.first_match(dependency)
+    return None if match is None else match[1]
+
+
+def load_library_names(gremlin_client):
+    if len(sys.argv) > 1:
+        with open(sys.argv[1]) as file:
+            return [line.strip() for line in file if line.strip()]
+
+    return execute_gremlin_query(gremlin_client, "g.V().has('type', 'library').values('name')")
+
+
+def time_classifier(name, classify, library_names):
+    start_time = perf_counter()
+    results = [classify(library_name) for library_name in library_names]
+    elapsed_time = perf_counter() - start_time
+    logging.info(f"{name}: {elapsed_time:.3f}s, {len(library_names) / elapsed_time:.0f} names/s")
+    return results, elapsed_time
+
+
+def main():
+    logging.getLogger().setLevel(logging.INFO)
+
+    gremlin_client = gremlin()
+    Dependency.init_padu()
+    Dependency.technologies = get_technologies(gremlin_client)
+    library_names = load_library_names(gremlin_client)
+    gremlin_client.close()
+
+    padu_regex_count = sum(len(tech["regexes"]) for tech in Dependency.padu)
+    technology_regex_count = sum(len(technology["regexes"]) for technology in Dependency.technologies)
+    logging.info(
+        f"{len(library_names)} library names, {padu_regex_count} PADU regexes, "
+        f"{technology_regex_count} technology regexes"
+    )
+
+    start_time = perf_counter()
+    Dependency.init_matchers()
+    logging.info(f"built matchers in {perf_counter() - start_time:.3f}s")
+
+    mismatches = 0
+    for table, loop, matcher in [
+        ("padu", lambda name: loop_padu_ranking(Dependency.padu, name), matcher_padu_ranking),
+        ("technology", lambda name: loop_technology(Dependency.technologies, name), matcher_technology),
+    ]:
+        expected, loop_time = time_classifier(f"{table} loop", loop, library_names)
+        # the first pass also compiles the per-candidate alternations, the second shows the steady state
+        time_classifier(f"{table} matcher (cold)", matcher, library_names)
+        actual, matcher_time = time_classifier(f"{table} matcher (warm)", matcher, library_names)
+        logging.info(f"{table} speedup: {loop_time / matcher_time:.1f}x")
+
+        for library_name, expected_result, actual_result in zip(library_names, expected, actual):
+            if expected_result != actual_result:
+                mismatches += 1
+                logging.error(f"{table} mismatch for {library_name}: loop {expected_result}, matcher {actual_result}")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,413 @@
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool
+from time import perf_counter, sleep
+
+# usage: python -m benchmarks.crawl [--repos 50] [--processes 1] [--save-baseline FILE | --baseline FILE]
+# Generates synthetic git repositories, then crawls them with Dependency.worker the way a run would, with GitHub
+# replaced by local file:// remotes, Gremlin by an in-process client that answers every query with nothing and
+# the Sonar API by canned responses.
+# Exits with status 1 when compared against a baseline and something got slower than the tolerance allows.
+# benchmarks/crawl-baseline.json is a run with the defaults; timings are only comparable on the same machine.
+
+benchmark_token = "benchmark-token"
+benchmark_owner = "benchmark-org"
+
+dependency_names = {
+    "npm": ["react", "lodash", "express", "@types/node", "typescript", "jest", "axios", "webpack"],
+    "maven": [
+        ("org.springframework", "spring-core"), ("junit", "junit"), ("com.google.guava", "guava"),
+        ("org.slf4j", "slf4j-api"), ("com.fasterxml.jackson.core", "jackson-databind"),
+    ],
+    "nuget": ["Newtonsoft.Json", "Serilog", "xunit", "Moq", "AutoMapper", "Dapper"],
+    "pip": ["requests", "flask", "numpy", "pandas", "pyyaml", "boto3", "pytest"],
+    "gradle": ["org.jetbrains.kotlin:kotlin-stdlib", "io.ktor:ktor-server-core", "junit:junit"],
+    "docker": ["python:3.9-alpine", "node:16", "openjdk:11-jre", "nginx:1.21", "alpine:3.15"],
+}
+
+
+def pick(generator: random.Random, names, count):
+    return generator.sample(names, min(count, len(names)))
+
+
+def generate_npm(generator, version):
+    dependencies = {name: f"^{version}.0.0" for name in pick(generator, dependency_names["npm"], 5)}
+    return "package.json", json.dumps({"name": "app", "dependencies": dependencies}, indent=2)
+
+
+def generate_maven(generator, version):
+    dependencies = "".join(
+        f"<dependency><groupId>{group}</groupId><artifactId>{artifact}</artifactId>"
+        f"<version>{version}.0</version></dependency>"
+        for group, artifact in pick(generator, dependency_names["maven"], 4)
+    )
+    return "pom.xml", f"<project><dependencies>{dependencies}</dependencies></project>"
+
+
+def generate_nuget(generator, version):
+    references = "".join(
+        f'<PackageReference Include="{name}" Version="{version}.0.0" />'
+        for name in pick(generator, dependency_names["nuget"], 4)
+    )
+    return "App.csproj", f"<Project><ItemGroup>{references}</ItemGroup></Project>"
+
+
+def generate_pip(generator, version):
+    return "requirements.txt", "".join(
+        f"{name}=={version}.0\n" for name in pick(generator, dependency_names["pip"], 5)
+    )
+
+
+def generate_gradle(generator, version):
+    # no parser reads build.gradle today, it is generated so the walk sees the files a real repo has
+    return "build.gradle", "dependencies {\n" + "".join(
+        f"    implementation '{name}:{version}.0'\n" for name in pick(generator, dependency_names["gradle"], 2)
+    ) + "}\n"
+
+
+def generate_docker(generator, version):
+    return "Dockerfile", f"FROM {generator.choice(dependency_names['docker'])}\nRUN echo {version}\n"
+
+
+def generate_vitals(generator, version):
+    return "vitals.yaml", (
+        "apiVersion: v1\nmetadata:\n  askId: poc\n  caAgileId: benchmark\n"
+        f"  projectKey: benchmark-{version}\n  projectFriendlyName: Benchmark\n"
+        "  componentType: code\n  targetQG: GATE_00\n"
+    )
+
+
+generators = {
+    "npm": generate_npm,
+    "maven": generate_maven,
+    "nuget": generate_nuget,
+    "pip": generate_pip,
+    "gradle": generate_gradle,
+    "docker": generate_docker,
+    "vitals": generate_vitals,
+}
+
+
+def parse_mix(mix: str) -> dict:
+    # "npm=3,maven=1" -> relative weight of each ecosystem when picking the manifests of a repo
+    weights = {}
+    for part in mix.split(","):
+        ecosystem, _, weight = part.partition("=")
+        if ecosystem not in generators:
+            raise ValueError(f"Unknown ecosystem {ecosystem!r}, expected one of {sorted(generators)}")
+        weights[ecosystem] = float(weight or 1)
+    return weights
+
+
+def run_git(args, cwd):
+    subprocess.check_output(["git", *args], cwd=cwd, stderr=subprocess.STDOUT, text=True)
+
+
+def generate_repository(path: str, generator: random.Random, options) -> str:
+    os.makedirs(path)
+    run_git(["init", "--quiet"], path)
+    # lets the partial clone mode filter blobs on a file:// remote, like GitHub does
+    run_git(["config", "uploadpack.allowFilter", "true"], path)
+
+    ecosystems = list(options.mix)
+    weights = [options.mix[ecosystem] for ecosystem in ecosystems]
+    modules = [f"module{index}" for index in range(options.manifests)]
+    module_ecosystems = {module: generator.choices(ecosystems, weights)[0] for module in modules}
+    if "vitals" in options.mix:
+        module_ecosystems["."] = "vitals"
+
+    for commit in range(options.commits):
+        for module, ecosystem in module_ecosystems.items():
+            # manifests change in a few commits only, source files in every one
+            if commit == 0 or generator.random() < 0.1:
+                file_name, content = generators[ecosystem](generator, commit)
+                os.makedirs(os.path.join(path, module), exist_ok=True)
+                with open(os.path.join(path, module, file_name), "w") as file:
+                    file.write(content)
+        for index in range(options.source_files):
+            source_path = os.path.join(path, "src", f"file{index}.txt")
+            os.makedirs(os.path.dirname(source_path), exist_ok=True)
+            with open(source_path, "a") as file:
+                file.write(f"{commit} {generator.random()}\n" * 20)
+        if commit == 0:
+            with open(os.path.join(path, "README.md"), "w") as file:
+                file.write("# benchmark\n")
+
+        author = f"author{generator.randrange(5)}@example.com"
+        run_git(["add", "-A"], path)
+        run_git(
+            ["-c", f"user.email={author}", "-c", "user.name=benchmark", "commit", "--quiet", "-m", f"commit {commit}"],
+            path,
+        )
+
+    return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=path, text=True).strip()
+
+
+class FakeResultSet:
+    def __init__(self, result) -> None:
+        self.result_list = result
+
+    def all(self):
+        return self
+
+    def result(self):
+        return self.result_list
+
+
+# Stands in for gremlin_python's client: every query succeeds with an empty result after latency_seconds, and
+# up to pool_size of them are answered concurrently, like requests spread over a connection pool.
+class FakeGremlinClient:
+    def __init__(self, latency_seconds: float, pool_size: int) -> None:
+        self.latency_seconds = latency_seconds
+        self.executor = ThreadPoolExecutor(max_workers=pool_size)
+
+    def answer(self, query):
+        if self.latency_seconds:
+            sleep(self.latency_seconds)
+        return FakeResultSet([])
+
+    def submitAsync(self, query, bindings=None):
+        return self.executor.submit(self.answer, query)
+
+
+def fake_sonar_get(url, params=None, **kwargs):
+    # answers the Sonar API's requests in place of requests.get, so the parser's own handling of them still runs
+    import requests
+
+    if url.endswith("/measures/component"):
+        metric_keys = params["metricKeys"].split(",")
+        body = {"component": {"measures": [{"metric": key, "value": "1"} for key in metric_keys]}}
+    else:
+        body = {"qualityGate": {"name": "GATE_00"}}
+    response = requests.models.Response()
+    response.status_code = 200
+    response.url = url
+    response._content = json.dumps(body).encode("utf-8")
+    return response
+
+
+def generate_padu(count: int):
+    names = [name for names in dependency_names.values() for name in names if isinstance(name, str)]
+    padu = [
+        {"name": f"tech-{index}", "ranking": "Preferred", "regexes": [re.compile(f"^{re.escape(name)}$")],
+         "type": "technology"}
+        for index, name in enumerate(names)
+    ]
+    # the real table is mostly entries that never match, which is what the matcher has to get through
+    padu += [
+        {"name": f"filler-{index}", "ranking": "Discouraged", "regexes": [re.compile(f"^filler-{index}[a-z]*$")],
+         "type": "technology"}
+        for index in range(count)
+    ]
+    technologies = [
+        {"id": f"technology.{entry['name']}", "pk": "technology", "regexes": entry["regexes"]} for entry in padu
+    ]
+    return padu, technologies
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def summarize(samples):
+    return {
+        "count": len(samples),
+        "p50": percentile(samples, 0.5),
+        "p90": percentile(samples, 0.9),
+        "p99": percentile(samples, 0.99),
+        "max": max(samples) if samples else None,
+    }
+
+
+def collect_samples(snapshot: dict, samples: dict):
+    # one sample per repo and histogram: the time the repo spent in that stage (or parser) in total
+    for (name, labels), histogram in snapshot["histograms"].items():
+        if name not in ("stage_seconds", "parser_seconds"):
+            continue
+        label = f"{name[:-len('_seconds')]}:{dict(labels).get('stage') or dict(labels).get('parser')}"
+        samples.setdefault(label, []).append(histogram[-1])
+
+
+def get_peak_rss_mb():
+    # ru_maxrss is in KiB on Linux; children covers pool workers and the git processes they ran
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return {"main": round(own, 1), "children": round(children, 1)}
+
+
+def compare_to_baseline(report: dict, baseline: dict, tolerance: float):
+    regressions = []
+
+    def check(name, current, previous, higher_is_better=False):
+        if current is None or not previous:
+            return
+        change = (current - previous) / previous
+        regressed = change < -tolerance if higher_is_better else change > tolerance
+        logging.info(f"{name}: {previous:.4f} -> {current:.4f} ({change:+.1%}){' REGRESSION' if regressed else ''}")
+        if regressed:
+            regressions.append(name)
+
+    check("repos/sec", report["reposPerSecond"], baseline.get("reposPerSecond"), higher_is_better=True)
+    for stage, summary in report["latencies"].items():
+        previous = baseline.get("latencies", {}).get(stage)
+        if previous:
+            check(f"{stage} p50", summary["p50"], previous["p50"])
+            check(f"{stage} p90", summary["p90"], previous["p90"])
+    check("peak RSS (MB)", report["peakRssMb"]["main"], baseline.get("peakRssMb", {}).get("main"))
+
+    return regressions
+
+
+def parse_arguments():
+    arguments = argparse.ArgumentParser(description="Crawl synthetic repositories and report throughput")
+    arguments.add_argument("--repos", type=int, default=50)
+    arguments.add_argument("--manifests", type=int, default=4, help="manifest directories per repo")
+    arguments.add_argument("--commits", type=int, default=20)
+    arguments.add_argument("--source-files", type=int, default=10, help="non-manifest files changed per commit")
+    arguments.add_argument("--mix", type=parse_mix, default="npm=3,maven=2,nuget=1,pip=2,gradle=1,docker=2,vitals=1")
+    arguments.add_argument("--padu-size", type=int, default=500, help="PADU entries that never match")
+    arguments.add_argument("--processes", type=int, default=1)
+    arguments.add_argument("--clone-mode", choices=["full", "partial"], default="full")
+    arguments.add_argument("--gremlin-latency-ms", type=float, default=0)
+    arguments.add_argument("--workdir", default=None, help="defaults to a new temporary directory")
+    arguments.add_argument("--seed", type=int, default=0)
+    arguments.add_argument("--output", default=None, help="write the report here as well as logging it")
+    arguments.add_argument("--save-baseline", default=None, help="write the report as the new baseline")
+    arguments.add_argument("--baseline", default=None, help="compare against a report saved with --save-baseline")
+    arguments.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before failing")
+    return arguments.parse_args()
+
+
+def configure_environment(options, workdir: str):
+    # everything Dependency reads at import time, pointed at the workdir so runs never share state
+    os.environ.setdefault("GITHUB_API_TOKEN", benchmark_token)
+    os.environ.setdefault("COSMOS_URI", "https://localhost")
+    os.environ.setdefault("COSMOS_PRIMARY_KEY", "benchmark")
+    os.environ.setdefault("COSMOS_GRAPH_PRIMARY_KEY", "benchmark")
+    os.environ["CLONE_MODE"] = options.clone_mode
+    os.environ["CLASSIFICATION_CACHE_PATH"] = os.path.join(workdir, "classifications.sqlite")
+    os.environ["PARSE_CACHE_PATH"] = os.path.join(workdir, "parse-results.sqlite")
+    os.environ["RUN_JOURNAL_PATH"] = os.path.join(workdir, "runs.sqlite")
+    os.environ["WORKSPACE_PATH"] = os.path.join(workdir, "workspaces")
+    os.environ["METRICS_PATH"] = ""
+    os.environ["GREMLIN_MAX_IN_FLIGHT"] = os.environ.get("GREMLIN_MAX_IN_FLIGHT", "4")
+    # the worker initializer sets a global git option, which must not land in the user's own config
+    os.environ["GIT_CONFIG_GLOBAL"] = os.path.join(workdir, "gitconfig")
+    # clone urls point at github.com, rewrite them to the generated repositories
+    os.environ["GIT_CONFIG_COUNT"] = "1"
+    os.environ["GIT_CONFIG_KEY_0"] = f"url.file://{workdir}/remotes/.insteadOf"
+    os.environ["GIT_CONFIG_VALUE_0"] = "https://github.com/"
+    # Dependency and the GitHub client read the org and repo to crawl from the positional arguments
+    del sys.argv[1:]
+
+
+def main():
+    options = parse_arguments()
+    workdir = os.path.abspath(options.workdir or tempfile.mkdtemp(prefix="crawl-benchmark-"))
+    # the workers chdir into their workspaces, so relative paths would not survive the run
+    output_paths = [os.path.abspath(path) for path in (options.output, options.save_baseline) if path]
+    baseline_path = os.path.abspath(options.baseline) if options.baseline else None
+    configure_environment(options, workdir)
+
+    import Dependency
+    import clients.gremlin
+    import handlers.sonar
+    from model.repository import RepositorySummary
+    from utils.metrics import format_labels, metrics
+
+    # the crawl's own logging would drown the report, and dominate the timings at DEBUG
+    logging.getLogger().setLevel(logging.WARNING)
+
+    generator = random.Random(options.seed)
+    start_time = perf_counter()
+    repos = []
+    for index in range(options.repos):
+        name = f"repo{index}"
+        head_hash = generate_repository(
+            os.path.join(workdir, "remotes", benchmark_owner, name), generator, options
+        )
+        repos.append(RepositorySummary(
+            benchmark_owner, name, f"https://github.com/{benchmark_owner}/{name}", True, False, False, 0, head_hash
+        ))
+    print(f"Generated {options.repos} repositories in {perf_counter() - start_time:.1f}s in {workdir}", file=sys.stderr)
+
+    padu, technologies = generate_padu(options.padu_size)
+    gremlin_client = FakeGremlinClient(options.gremlin_latency_ms / 1000, clients.gremlin.gremlin_max_in_flight)
+    Dependency.gremlin = lambda: gremlin_client
+    Dependency.gremlin_client = gremlin_client
+    Dependency.padu = padu
+    Dependency.technologies = technologies
+    handlers.sonar.requests.get = fake_sonar_get
+    initargs = (technologies, padu, {}, Dependency.timestamp)
+
+    samples = {}
+    repo_seconds = []
+    failures = 0
+    start_time = perf_counter()
+    if options.processes > 1:
+        with Pool(options.processes, initializer=Dependency.initialize_worker, initargs=initargs) as pool:
+            results = list(pool.imap_unordered(Dependency.worker, repos))
+    else:
+        Dependency.initialize_worker(*initargs)
+        results = [Dependency.worker(repo) for repo in repos]
+    elapsed_time = perf_counter() - start_time
+
+    for _, status, snapshot in results:
+        failures += status != "completed"
+        collect_samples(snapshot, samples)
+        for (name, _), histogram in snapshot["histograms"].items():
+            if name == "repo_seconds":
+                repo_seconds.append(histogram[-1])
+        metrics.merge(snapshot)
+
+    report = {
+        "repos": options.repos,
+        "failures": failures,
+        "processes": options.processes,
+        "cloneMode": options.clone_mode,
+        "gremlinLatencyMs": options.gremlin_latency_ms,
+        "elapsedSeconds": elapsed_time,
+        "reposPerSecond": options.repos / elapsed_time,
+        "latencies": {"repo": summarize(repo_seconds), **{
+            label: summarize(values) for label, values in sorted(samples.items())
+        }},
+        "peakRssMb": get_peak_rss_mb(),
+        "counters": {
+            f"{name}{format_labels(labels)}": value for (name, labels), value in sorted(metrics.counters.items())
+        },
+    }
+
+    content = json.dumps(report, indent=2)
+    print(content)
+    for path in output_paths:
+        with open(path, "w") as file:
+            file.write(content)
+
+    exit_code = 1 if failures else 0
+    if baseline_path:
+        with open(baseline_path) as file:
+            baseline = json.load(file)
+        logging.getLogger().setLevel(logging.INFO)
+        regressions = compare_to_baseline(report, baseline, options.tolerance)
+        if regressions:
+            logging.error(f"Regressed beyond {options.tolerance:.0%}: {', '.join(regressions)}")
+            exit_code = 1
+
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
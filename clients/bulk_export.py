@@ -0,0 +1,169 @@
+import gzip
+import json
+import logging
+import os
+import re
+import tempfile
+import zlib
+from collections import defaultdict
+from typing import Dict, Iterator, List
+
+# one directory per crawler run below this, see get_run_path
+bulk_export_path = os.environ.setdefault("BULK_EXPORT_PATH", os.path.join(tempfile.gettempdir(), "Dependency-export"))
+# number of files each kind of record is spread over; records of one pk always land in the same one
+bulk_export_partitions = int(os.environ.setdefault("BULK_EXPORT_PARTITIONS", "64"))
+
+KIND_VERTICES = "vertices"
+KIND_EDGES = "edges"
+# property updates and cleanups, applied once every vertex and edge is loaded
+KIND_UPDATES = "updates"
+
+kinds = (KIND_VERTICES, KIND_EDGES, KIND_UPDATES)
+
+# written by the crawler when it starts exporting a run, and by load_graph.py once it has applied the run
+run_file_name = "run.json"
+loaded_file_name = "loaded.json"
+
+
+def get_run_path(path: str, timestamp: str) -> str:
+    # one directory per run, named so that runs sort in the order they were started
+    return os.path.join(path, re.sub(r"[^0-9A-Za-z.]", "-", timestamp))
+
+
+def start_export(path: str, timestamp: str) -> str:
+    # a resumed run keeps its timestamp and so appends to the directory it started
+    run_path = get_run_path(path, timestamp)
+    os.makedirs(run_path, exist_ok=True)
+    with open(os.path.join(run_path, run_file_name), "w") as file:
+        json.dump({"timestamp": timestamp}, file)
+    return run_path
+
+
+def read_run(run_path: str) -> dict:
+    with open(os.path.join(run_path, run_file_name)) as file:
+        return json.load(file)
+
+
+def get_partition(pk: str, partitions: int = None) -> int:
+    # crc32 rather than hash(), which is salted per process
+    return zlib.crc32(pk.encode("utf-8")) % (partitions or bulk_export_partitions)
+
+
+def get_file_name(kind: str, partition: int) -> str:
+    # every process appends to files of its own, so concurrent workers never interleave their writes
+    return f"{kind}-{partition:04d}.{os.getpid()}.jsonl.gz"
+
+
+def parse_file_name(file_name: str):
+    # (kind, partition) of an export file, None for anything else in the directory
+    if not file_name.endswith(".jsonl.gz"):
+        return None
+    kind, _, rest = file_name.partition("-")
+    partition = rest.split(".", 1)[0]
+    if kind not in kinds or not partition.isdigit():
+        return None
+    return kind, int(partition)
+
+
+def list_partitions(path: str) -> Dict[str, Dict[int, List[str]]]:
+    # kind -> partition -> files, every worker's file of a partition together
+    partitions = {kind: defaultdict(list) for kind in kinds}
+    for file_name in sorted(os.listdir(path)):
+        parsed = parse_file_name(file_name)
+        if parsed is not None:
+            kind, partition = parsed
+            partitions[kind][partition].append(os.path.join(path, file_name))
+    return partitions
+
+
+def read_records(file_paths: List[str]) -> Iterator[dict]:
+    for file_path in file_paths:
+        # a file is one gzip member per flush, which gzip reads back as a single stream
+        with gzip.open(file_path, "rt", encoding="utf-8") as file:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+# Writes what GremlinBatchWriter would upsert to compressed JSONL files in a run's directory instead, for
+# load_graph.py to apply to the graph later in large batches. Vertex and update records are partitioned by their
+# pk and edge records by the pk of their source vertex, the partition Cosmos keeps them in.
+#
+# Records are buffered until flush, which appends them as one gzip member per file. Nothing is kept open between
+# flushes, so a pool worker that exits after maxtasksperchild tasks leaves only complete files behind.
+class BulkExportWriter:
+    def __init__(self, run_path, timestamp, written_vertices=None, partitions=None):
+        self.path = run_path
+        self.timestamp = timestamp
+        self.written_vertices = written_vertices
+        self.partitions = partitions or bulk_export_partitions
+        # (kind, partition) -> lines
+        self.buffers = defaultdict(list)
+        self.vertex_keys = []
+        self.upserts = 0
+        self.skipped_upserts = 0
+        self.round_trips = 0
+        # a failed write raises, there is nothing to retry later
+        self.errors = []
+
+    def add(self, kind, pk, record):
+        self.buffers[(kind, get_partition(pk, self.partitions))].append(json.dumps(record))
+
+    def upsert_vertex(self, vertex_id, vertex_pk, properties, once=False, stored_properties=None):
+        # stored_properties is not used: load_graph.py merges every write of a vertex into one upsert, and the graph
+        # may have changed by the time it does
+        if once and self.written_vertices is not None:
+            if (vertex_id, vertex_pk) in self.written_vertices:
+                self.skipped_upserts += 1
+                return
+            self.vertex_keys.append((vertex_id, vertex_pk))
+
+        properties["lastScanned"] = self.timestamp
+        self.add(KIND_VERTICES, vertex_pk, {"id": vertex_id, "pk": vertex_pk, "properties": properties})
+        self.upserts += 1
+
+    def upsert_edge(
+        self,
+        edge_label,
+        source_vertex_id,
+        source_vertex_pk,
+        destination_vertex_id,
+        destination_vertex_pk,
+        properties,
+    ):
+        properties["lastScanned"] = self.timestamp
+        self.add(KIND_EDGES, source_vertex_pk, {
+            "label": edge_label,
+            "source_vertex_id": source_vertex_id,
+            "source_vertex_pk": source_vertex_pk,
+            "destination_vertex_id": destination_vertex_id,
+            "destination_vertex_pk": destination_vertex_pk,
+            "properties": properties,
+        })
+        self.upserts += 1
+
+    def set_property(self, vertex_id, vertex_pk, key, value):
+        self.add(KIND_UPDATES, vertex_pk, {
+            "op": "property", "id": vertex_id, "pk": vertex_pk, "key": key, "value": value
+        })
+
+    def cleanup_stale(self, vertex_id, vertex_pk, neighbor_labels=()):
+        # the loader applies cleanups after all of the run's vertices and edges; written out right away like
+        # GremlinBatchWriter's, which runs them on the spot
+        self.add(KIND_UPDATES, vertex_pk, {
+            "op": "cleanup", "id": vertex_id, "pk": vertex_pk, "neighbor_labels": list(neighbor_labels)
+        })
+        self.flush()
+
+    def flush(self):
+        buffers = self.buffers
+        self.buffers = defaultdict(list)
+        for (kind, partition), lines in sorted(buffers.items()):
+            with gzip.open(os.path.join(self.path, get_file_name(kind, partition)), "at", encoding="utf-8") as file:
+                file.write("\n".join(lines) + "\n")
+            self.round_trips += 1
+
+        if self.vertex_keys:
+            self.written_vertices.update(dict.fromkeys(self.vertex_keys, True))
+            self.vertex_keys = []
+        logging.debug(f"Exported {sum(len(lines) for lines in buffers.values())} records to {self.path}")
@@ -4,10 +4,11 @@ import os
 import requests
 import time
 
-from typing import List
+from typing import Iterator, List
 from dotenv import load_dotenv
 from github import Github, Organization
 from github.Repository import Repository
+from model.repository import RepositorySummary
 from utils.rate_limiter import rate_limited_retry, rate_limited_retry_gql
 
 load_dotenv()
@@ -15,6 +16,9 @@ load_dotenv()
 
 
 token = os.environ["GITHUB_API_TOKEN"]
+# api.github.com unless set, e.g. https://<host>/api/v3 and https://<host>/api/graphql for GitHub Enterprise
+github_base_url = os.environ.setdefault("GITHUB_BASE_URL", "https://api.github.com")
+gql_github_base_url = os.environ.setdefault("GITHUB_GRAPHQL_URL", "https://api.github.com/graphql")
 
 github = Github(token, base_url=github_base_url, per_page=100)
 
@@ -61,22 +65,104 @@ def get_all_repos(organization: Organization) -> List[Repository]:
 
 
 def get_all_repos_gql(organization: Organization) -> List[dict]:
-    repos = []
+    return list(iter_all_repos_gql(organization))
+
+
+# yields each page's repositories as soon as it arrives, so callers can start on them while later pages load
+def iter_all_repos_gql(organization: Organization) -> Iterator[dict]:
     try:
         cursor = None
         has_next_page = True
         while has_next_page:
             repo_list = get_gql_response(organization.login, cursor)["data"]["organization"]["repositories"]
-            repos.extend(repo_list["nodes"])
+            yield from repo_list["nodes"]
             cursor = repo_list["pageInfo"]["endCursor"]
             has_next_page = repo_list["pageInfo"]["hasNextPage"]
-        return repos
     except Exception as e:
         try:
             logging.exception(f"Exception when getting all the repos for {organization}", e)
         except Exception as e:
             logging.exception(f"Exception when getting all the repos for an organization (couldn't lookup login) %s", e)
-        return repos
+
+
+def get_all_repos_with_head_gql(organization: Organization) -> List[RepositorySummary]:
+    return list(iter_all_repos_with_head_gql(organization))
+
+
+def iter_all_repos_with_head_gql(organization: Organization) -> Iterator[RepositorySummary]:
+    try:
+        cursor = None
+        has_next_page = True
+        while has_next_page:
+            repo_list = get_head_gql_response(organization.login, cursor)["data"]["organization"]["repositories"]
+            for node in repo_list["nodes"]:
+                logging.info(f"will process {node['nameWithOwner']}")
+                yield map_repository_summary(node)
+            cursor = repo_list["pageInfo"]["endCursor"]
+            has_next_page = repo_list["pageInfo"]["hasNextPage"]
+    except Exception as e:
+        try:
+            logging.exception(f"Exception when getting all the repos for {organization}", e)
+        except Exception as e:
+            logging.exception(f"Exception when getting all the repos for an organization (couldn't lookup login) %s", e)
+
+
+def map_repository_summary(node: dict) -> RepositorySummary:
+    # empty repositories have no default branch, which git ls-remote reports as an empty hash
+    head_hash = ""
+    if node["defaultBranchRef"] is not None and node["defaultBranchRef"]["target"] is not None:
+        head_hash = node["defaultBranchRef"]["target"]["oid"]
+
+    return RepositorySummary(
+        owner=node["owner"]["login"],
+        name=node["name"],
+        url=node["url"],
+        private=node["isPrivate"],
+        archived=node["isArchived"],
+        fork=node["isFork"],
+        size=node["diskUsage"],
+        head_hash=head_hash,
+    )
+
+
+@rate_limited_retry_gql(token, gql_github_base_url)
+def get_head_gql_response(login: str, cursor=None):
+    headers = {"Authorization": f"Bearer {token}"}
+    variables = {"login": login, "cursor": cursor}
+    gql_query = """
+        query getGitHubRepoHeads($login: String!, $cursor: String) {
+          organization(login: $login) {
+            repositories(first: 100, after: $cursor) {
+              pageInfo {
+                endCursor
+                hasNextPage
+              }
+              nodes {
+                url
+                name
+                nameWithOwner
+                owner {
+                  login
+                }
+                diskUsage
+                isArchived
+                isFork
+                isPrivate
+                defaultBranchRef {
+                  target {
+                    oid
+                  }
+                }
+              }
+            }
+          }
+        }
+        """
+    response = requests.post(gql_github_base_url, json={"query": gql_query, "variables": variables}, headers=headers)
+    if response.status_code == 200:
+        return response.json()
+    else:
+        response.raise_for_status()
 
 
 # This should make 2 calls per query
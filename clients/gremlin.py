@@ -1,14 +1,48 @@
 import logging
 import os
 import re
+import tempfile
+from collections import deque
+from time import sleep, time
 from urllib.parse import unquote
 
 import backoff
 from gremlin_python.driver import client, serializer
 from gremlin_python.driver.protocol import GremlinServerError
 
+from clients.gremlin_templates import (
+    DROP_VERTEX,
+    EDGE,
+    VERTEX,
+    get_batch_bindings,
+    get_batch_limit,
+    get_batch_script,
+    get_capacity,
+    get_drop_vertex_statements,
+    get_edge_statements,
+    get_script_id,
+    get_slot_capacity,
+    get_vertex_statements,
+)
+from clients.local_graph import LocalGraphClient
+from utils.metrics import metrics
+
 cosmos_graph_primary_key = os.environ["COSMOS_GRAPH_PRIMARY_KEY"]
 
+# number of vertex/edge upserts packed into a single request by GremlinBatchWriter
+gremlin_batch_size = int(os.environ.setdefault("GREMLIN_BATCH_SIZE", "25"))
+# number of requests a GremlinPipeline keeps submitted at once, also the size of the client's connection pool
+gremlin_max_in_flight = int(os.environ.setdefault("GREMLIN_MAX_IN_FLIGHT", "4"))
+# "cosmos", or "local" for the in-process stand-in in clients/local_graph.py (development, tests, benchmarks)
+graph_backend = os.environ.setdefault("GRAPH_BACKEND", "cosmos")
+# how GremlinBatchWriter.cleanup_stale finds what a scan did not refresh: "timestamp" has the server compare every
+# edge's lastScanned, "diff" fetches only the IDs of the edges and compares them with the ones the writer wrote
+cleanup_mode = os.environ.setdefault("CLEANUP_MODE", "timestamp")
+# SQLite file of the local graph, shared by pool workers; ":memory:" gives each process a graph of its own
+graph_local_path = os.environ.setdefault(
+    "GRAPH_LOCAL_PATH", os.path.join(tempfile.gettempdir(), "Dependency-graph.sqlite")
+)
+
 logging.basicConfig(
     format="%(process)s %(asctime)s %(levelname)-8s %(message)s",
     level=logging.INFO,
@@ -17,12 +51,18 @@ logging.basicConfig(
 
 
 def gremlin():
+    if graph_backend == "local":
+        return LocalGraphClient(graph_local_path)
+    if graph_backend != "cosmos":
+        raise ValueError(f"Unknown GRAPH_BACKEND {graph_backend}, expected cosmos or local")
+
     return client.Client(
         "wss://Dependency-graph-cosmosdb-account.gremlin.cosmos.azure.com:443/",
         "g",
         username="/dbs/DependencyGraphDatabase/colls/DependencyGraph",
         password=cosmos_graph_primary_key,
         message_serializer=serializer.GraphSONSerializersV2d0(),
+        pool_size=gremlin_max_in_flight,
     )
 
 
@@ -32,83 +72,50 @@ def gremlin():
 #         logging.info("Dropped the graph")
 
 
-def map_properties_to_gremlin_string(props):
-    gremlin_string = ""
-    bindings = {}
-    for key, value in props.items():
-        bindings[key] = key
-
-        if isinstance(value, list):
-            for index, val in enumerate(value):
-                val_binding_key = f"{key}{index}"
-                bindings[val_binding_key] = val
-                gremlin_string += (
-                    f".property(Cardinality.list, {key}, {val_binding_key})"
-                )
-        else:
-            # handle it as a single value
-            val_binding_key = f"{key}0"
-            bindings[val_binding_key] = value
-            gremlin_string += f".property(Cardinality.single, {key}, {val_binding_key})"
-
-    return gremlin_string, bindings
-
-
-def get_drop_statements(props):
-    gremlin_string = ""
-    bindings = {}
-
-    for key, value in props.items():
-
-        if isinstance(value, list):
-            drop_binding_key = f"drop{key}"
-            bindings[drop_binding_key] = key
-            # we need to explode the value into a concatenation of gremlin strings
-            gremlin_string += f".sideEffect(properties({drop_binding_key}).drop())"
+def get_vertex_properties(vertex):
+    # {key: [values]} of a vertex as get_vertex returns it, None when there is no vertex
+    if vertex is None:
+        return None
+    return {key: [entry["value"] for entry in entries] for key, entries in vertex.get("properties", {}).items()}
+
+
+def diff_properties(stored_properties, properties):
+    # splits properties into the ones to rewrite and the list values to add, leaving out whatever stored_properties
+    # already holds. A list that lost values is rewritten whole, like every list is without a stored copy
+    rewrite = {}
+    additions = {}
+    for key, value in properties.items():
+        stored_values = stored_properties.get(key)
+        if not isinstance(value, list):
+            if stored_values != [value]:
+                rewrite[key] = value
+        elif stored_values is None:
+            if value:
+                additions[key] = value
+        elif any(stored_value not in value for stored_value in stored_values):
+            rewrite[key] = value
         else:
-            gremlin_string += ""
-
-    return gremlin_string, bindings
-
-
-def get_property_string(properties):
-    bindings = {}
-    if properties is None:
-        return "", {}
-
-    drop_gremlin_string, drop_bindings = get_drop_statements(properties)
-    prop_gremlin_string, prop_bindings = map_properties_to_gremlin_string(properties)
-
-    bindings.update(drop_bindings)
-    bindings.update(prop_bindings)
-
-    return drop_gremlin_string + prop_gremlin_string, bindings
+            added_values = [val for val in value if val not in stored_values]
+            if added_values:
+                additions[key] = added_values
+    return rewrite, additions
 
 
 def get_edges_by_vertex_and_label(gremlin_client, vertex_id, vertex_pk, label):
-    gremlin_query = f"g.V('{vertex_id}').has('pk','{vertex_pk}')." f"outE(label)"
+    gremlin_query = "g.V(vertex_id).has('pk',vertex_pk).outE(label)"
 
-    return execute_gremlin_query(gremlin_client, gremlin_query, {"label": label})
+    return execute_gremlin_query(
+        gremlin_client, gremlin_query, {"vertex_id": vertex_id, "vertex_pk": vertex_pk, "label": label}
+    )
 
 
 def upsert_gremlin_vertex(gremlin_client, vertex_id, vertex_pk, properties, timestamp):
-    bindings = {"timestamp": timestamp, "vertex_id": vertex_id, "vertex_pk": vertex_pk}
-
-    properties["lastScanned"] = timestamp
-
-    prop_gremlin_string, prop_bindings = get_property_string(properties)
-    bindings.update(prop_bindings)
-
-    gremlin_query = (
-        f"g.V(vertex_id).has('pk',vertex_pk)."
-        f"fold()."
-        f"coalesce(unfold(),"
-        f"addV().property(T.id, vertex_id).property('pk', vertex_pk).property('created', timestamp))"
-        f"{prop_gremlin_string}"
-    )
-
-    result = execute_gremlin_query(gremlin_client, gremlin_query, bindings)
-    logging.debug(f"Upserted {result}")
+    writer = GremlinBatchWriter(gremlin_client, timestamp)
+    writer.upsert_vertex(vertex_id, vertex_pk, properties)
+    writer.flush()
+    if writer.errors:
+        raise Exception(f"Failed to upsert {vertex_id}: {writer.errors[0][1]}")
+    logging.debug(f"Upserted {writer.pipeline.results}")
 
 
 def cleanup_old_edges(
@@ -145,6 +152,20 @@ def cleanup_old_outbound_neighbors(
     logging.debug(f"Cleaned up neighbors: {result}")
 
 
+def get_edge_ids(gremlin_client, vertex_id, vertex_pk, timestamp_property):
+    gremlin_query = "g.V(vertex_id).has('pk',vertex_pk).bothE().has(timestamp_property).id()"
+    bindings = {"vertex_id": vertex_id, "vertex_pk": vertex_pk, "timestamp_property": timestamp_property}
+    return execute_gremlin_query(gremlin_client, gremlin_query, bindings)
+
+
+def get_outbound_neighbor_keys(gremlin_client, vertex_id, vertex_pk, edge_label):
+    gremlin_query = (
+        "g.V(vertex_id).has('pk',vertex_pk).out(edge_label).project('id', 'pk').by(id).by(values('pk'))"
+    )
+    bindings = {"vertex_id": vertex_id, "vertex_pk": vertex_pk, "edge_label": edge_label}
+    return [(entry["id"], entry["pk"]) for entry in execute_gremlin_query(gremlin_client, gremlin_query, bindings)]
+
+
 def get_technologies(gremlin_client):
     gremlin_query = "g.V().has('type', 'technology')"
 
@@ -176,33 +197,307 @@ def upsert_gremlin_edge(
     properties,
     timestamp,
 ):
-    properties["lastScanned"] = timestamp
-
-    edge_id = f"{source_vertex_id}.{source_vertex_pk}-{destination_vertex_id}.{destination_vertex_pk}"
-    bindings = {
-        "edge_id": edge_id,
-        "source_vertex_id": source_vertex_id,
-        "source_vertex_pk": source_vertex_pk,
-        "destination_vertex_id": destination_vertex_id,
-        "destination_vertex_pk": destination_vertex_pk,
-        "edge_label": edge_label,
-        "timestamp": timestamp,
-    }
-    prop_gremlin_string, prop_bindings = get_property_string(properties)
-    bindings.update(prop_bindings)
-
-    gremlin_query = (
-        f"g.E(edge_id)."
-        f"fold()."
-        f"coalesce(unfold(),"
-        f"g.V(source_vertex_id).has('pk', source_vertex_pk).as('source')."
-        f"V(destination_vertex_id).has('pk', destination_vertex_pk)."
-        f"addE(edge_label).from('source').property(T.id, edge_id).property('created', timestamp))"
-        f"{prop_gremlin_string}"
+    writer = GremlinBatchWriter(gremlin_client, timestamp)
+    writer.upsert_edge(
+        edge_label, source_vertex_id, source_vertex_pk, destination_vertex_id, destination_vertex_pk, properties
     )
-
-    result = execute_gremlin_query(gremlin_client, gremlin_query, bindings)
-    logging.debug(f"Upserted edge {result}")
+    writer.flush()
+    if writer.errors:
+        raise Exception(f"Failed to upsert edge {edge_label}: {writer.errors[0][1]}")
+    logging.debug(f"Upserted edge {writer.pipeline.results}")
+
+
+def get_edge_id(source_vertex_id, source_vertex_pk, destination_vertex_id, destination_vertex_pk):
+    return f"{source_vertex_id}.{source_vertex_pk}-{destination_vertex_id}.{destination_vertex_pk}"
+
+
+# Statements of one template, sent as one of its fixed scripts, see clients/gremlin_templates.py
+class GremlinBatch:
+    def __init__(self, timestamp, kind):
+        self.timestamp = timestamp
+        self.kind = kind
+        # the bindings of each statement, without their prefix
+        self.statements = []
+        # (id, pk) of the run-once vertices in this batch, registered as written when the batch succeeds
+        self.vertex_keys = []
+
+    def query(self, batch_size):
+        # (script, bindings)
+        capacity = get_capacity(len(self.statements), get_batch_limit(self.kind, batch_size))
+        slots = get_slot_capacity(self.statements)
+        return (
+            get_batch_script(self.kind, capacity, slots),
+            get_batch_bindings(self.kind, self.statements, capacity, slots, self.timestamp),
+        )
+
+
+# Keeps up to max_in_flight queries submitted on the client's connection pool instead of waiting for each one.
+# Failed queries are resubmitted with the same exponential backoff execute_gremlin_query uses, and whatever still
+# fails after max_time is collected in errors rather than raised.
+class GremlinPipeline:
+    def __init__(self, gremlin_client, max_in_flight=None, max_time=60):
+        self.gremlin_client = gremlin_client
+        self.max_in_flight = max_in_flight if max_in_flight is not None else gremlin_max_in_flight
+        self.max_time = max_time
+        self.in_flight = deque()
+        self.results = []
+        self.errors = []
+        self.requests = 0
+
+    def submit(self, query, bindings=None, on_success=None):
+        while len(self.in_flight) >= self.max_in_flight:
+            self.wait_for_oldest()
+
+        self.start({
+            "query": query,
+            "bindings": bindings,
+            "on_success": on_success,
+            "attempts": 0,
+            "first_submitted": time(),
+        })
+
+    def start(self, request):
+        logging.debug(f"Submitting this Gremlin query: {request['query']} with bindings: {request['bindings']}")
+        self.requests += 1
+        metrics.increment("gremlin_requests_total", kind="batch")
+        metrics.increment("gremlin_script_requests_total", script=get_script_id(request["query"]))
+        request["future"] = self.gremlin_client.submitAsync(request["query"], request["bindings"])
+        self.in_flight.append(request)
+
+    def wait_for_oldest(self):
+        request = self.in_flight.popleft()
+        try:
+            result_set = request["future"].result()
+            if result_set is None:
+                logging.error(f"{request['query']} failed to execute")
+                raise Exception(f"Failed to query gremlin: {request['query']}")
+            result = result_set.all().result()
+        except (GremlinServerError, AttributeError) as e:
+            elapsed_time = time() - request["first_submitted"]
+            if elapsed_time >= self.max_time:
+                logging.error(f"Giving up on Gremlin query after {elapsed_time} seconds: {e}")
+                self.errors.append((request["query"], e))
+                return
+            # same schedule as backoff.expo: 1, 2, 4, ... seconds, each with full jitter
+            wait = backoff.full_jitter(2 ** request["attempts"])
+            request["attempts"] += 1
+            logging.info(f"Backing off {wait:.1f} seconds before resubmitting Gremlin query: {e}")
+            sleep(wait)
+            self.start(request)
+            return
+        except Exception as e:
+            self.errors.append((request["query"], e))
+            return
+
+        self.results.extend(result)
+        if request["on_success"] is not None:
+            request["on_success"](result)
+
+    def drain(self):
+        while self.in_flight:
+            self.wait_for_oldest()
+
+
+# Packs vertex and edge upserts into one traversal per batch. Every upsert runs inside its own sideEffect() off a
+# single injected traverser, so an upsert that produces nothing (e.g. an edge to a missing vertex) does not stop
+# the ones after it.
+#
+# Batches are sent through a GremlinPipeline. Edges need both of their vertices to exist, so edge batches are held
+# back until every vertex batch has been written.
+#
+# written_vertices is an optional registry (e.g. a multiprocessing.Manager dict) shared by every writer in a run.
+# Vertices upserted with once=True are skipped when any writer has already written them.
+class GremlinBatchWriter:
+    def __init__(self, gremlin_client, timestamp, batch_size=None, written_vertices=None, max_in_flight=None):
+        self.timestamp = timestamp
+        self.batch_size = batch_size if batch_size is not None else gremlin_batch_size
+        self.written_vertices = written_vertices
+        self.pipeline = GremlinPipeline(gremlin_client, max_in_flight)
+        self.vertex_batch = GremlinBatch(timestamp, VERTEX)
+        self.edge_batch = GremlinBatch(timestamp, EDGE)
+        self.edge_batches = []
+        self.upserts = 0
+        self.skipped_upserts = 0
+        # everything this writer upserted, what a "diff" cleanup keeps
+        self.written_vertex_keys = set()
+        self.written_edge_ids = set()
+
+    @property
+    def round_trips(self):
+        return self.pipeline.requests
+
+    @property
+    def errors(self):
+        return self.pipeline.errors
+
+    def upsert_vertex(self, vertex_id, vertex_pk, properties, once=False, stored_properties=None):
+        # stored_properties, the vertex's properties as get_vertex_properties returns them, limits the upsert to
+        # what changed and is kept up to date with what this writes
+        self.written_vertex_keys.add((vertex_id, vertex_pk))
+        if once and self.written_vertices is not None:
+            if (vertex_id, vertex_pk) in self.written_vertices:
+                self.skipped_upserts += 1
+                return
+
+        properties["lastScanned"] = self.timestamp
+        if stored_properties is not None:
+            self.update_vertex(vertex_id, vertex_pk, properties, stored_properties)
+            return
+
+        statements = get_vertex_statements(vertex_id, vertex_pk, properties, True, properties.keys())
+        once_key = (vertex_id, vertex_pk) if once and self.written_vertices is not None else None
+        self.add_vertex_statements(statements, once_key)
+        self.upserts += 1
+
+    def update_vertex(self, vertex_id, vertex_pk, properties, stored_properties):
+        rewrite, additions = diff_properties(stored_properties, properties)
+        changed = len(rewrite) + len(additions)
+        metrics.increment("vertex_properties_total", changed, outcome="written")
+        metrics.increment("vertex_properties_total", len(properties) - changed, outcome="unchanged")
+        if not changed:
+            # e.g. upserted once already with this timestamp
+            return
+
+        # the vertex was there when stored_properties was read; should it be gone by now, nothing is written
+        # rather than half a vertex
+        drop_keys = [key for key in rewrite if key in stored_properties]
+        self.add_vertex_statements(
+            get_vertex_statements(vertex_id, vertex_pk, {**rewrite, **additions}, False, drop_keys)
+        )
+        self.upserts += 1
+
+        for key, value in rewrite.items():
+            stored_properties[key] = list(value) if isinstance(value, list) else [value]
+        for key, values in additions.items():
+            stored_properties[key] = stored_properties.get(key, []) + values
+
+    def add_vertex_statements(self, statements, once_key=None):
+        # a vertex's statements stay in one batch, where they run in order: the statement dropping a list's old
+        # values must not run after another one added the new values
+        limit = get_batch_limit(VERTEX, self.batch_size)
+        if len(self.vertex_batch.statements) + len(statements) > limit:
+            self.submit_vertex_batch()
+        self.vertex_batch.statements += statements
+        if once_key is not None:
+            self.vertex_batch.vertex_keys.append(once_key)
+        if len(self.vertex_batch.statements) >= limit:
+            self.submit_vertex_batch()
+
+    def upsert_edge(
+        self,
+        edge_label,
+        source_vertex_id,
+        source_vertex_pk,
+        destination_vertex_id,
+        destination_vertex_pk,
+        properties,
+    ):
+        properties["lastScanned"] = self.timestamp
+        edge_id = get_edge_id(source_vertex_id, source_vertex_pk, destination_vertex_id, destination_vertex_pk)
+        self.written_edge_ids.add(edge_id)
+        statements = get_edge_statements(
+            edge_id, edge_label, source_vertex_id, source_vertex_pk, destination_vertex_id, destination_vertex_pk,
+            properties,
+        )
+        if len(self.edge_batch.statements) + len(statements) > self.batch_size:
+            self.hold_edge_batch()
+        self.edge_batch.statements += statements
+        self.upserts += 1
+
+        if len(self.edge_batch.statements) >= self.batch_size:
+            self.hold_edge_batch()
+
+    def hold_edge_batch(self):
+        # edge batches wait for flush, when every vertex batch has been written
+        if self.edge_batch.statements:
+            self.edge_batches.append(self.edge_batch)
+            self.edge_batch = GremlinBatch(self.timestamp, EDGE)
+
+    def set_property(self, vertex_id, vertex_pk, key, value):
+        # sets a single property of an existing vertex, without touching lastScanned
+        self.add_vertex_statements(get_vertex_statements(vertex_id, vertex_pk, {key: value}, False, [key]))
+        self.upserts += 1
+
+    def cleanup_stale(self, vertex_id, vertex_pk, neighbor_labels=(), mode=None):
+        # drops the vertex's edges, and its outbound neighbors over neighbor_labels, that this writer's timestamp
+        # did not refresh. Only call it after a flush without errors, or it drops what failed to be written
+        mode = mode or cleanup_mode
+        if mode == "diff":
+            self.cleanup_unwritten(vertex_id, vertex_pk, neighbor_labels)
+            return
+        if mode != "timestamp":
+            raise ValueError(f"Unknown CLEANUP_MODE {mode}, expected timestamp or diff")
+
+        for label in neighbor_labels:
+            cleanup_old_outbound_neighbors(
+                self.pipeline.gremlin_client, vertex_id, vertex_pk, label, "lastScanned", self.timestamp
+            )
+        cleanup_old_edges(self.pipeline.gremlin_client, vertex_id, vertex_pk, "lastScanned", self.timestamp)
+
+    def cleanup_unwritten(self, vertex_id, vertex_pk, neighbor_labels=()):
+        # the same cleanup computed on this side: only IDs come back from the server, and whatever this writer did
+        # not write is dropped by ID. Needs the writer to have written everything the vertex should keep, as
+        # update_cosmos_graph's does
+        batch = GremlinBatch(self.timestamp, DROP_VERTEX)
+        stale_neighbors = 0
+        for label in neighbor_labels:
+            for neighbor_id, neighbor_pk in get_outbound_neighbor_keys(
+                    self.pipeline.gremlin_client, vertex_id, vertex_pk, label
+            ):
+                if (neighbor_id, neighbor_pk) in self.written_vertex_keys:
+                    continue
+                stale_neighbors += 1
+                batch.statements += get_drop_vertex_statements(neighbor_id, neighbor_pk)
+                if len(batch.statements) >= self.batch_size:
+                    self.pipeline.submit(*batch.query(self.batch_size))
+                    batch = GremlinBatch(self.timestamp, DROP_VERTEX)
+        if batch.statements:
+            self.pipeline.submit(*batch.query(self.batch_size))
+        # dropping a neighbor drops its edges, so they must be gone before the edge IDs are listed
+        self.pipeline.drain()
+
+        edge_ids = get_edge_ids(self.pipeline.gremlin_client, vertex_id, vertex_pk, "lastScanned")
+        stale_edge_ids = [edge_id for edge_id in edge_ids if edge_id not in self.written_edge_ids]
+        # from the vertex, so Cosmos DB looks the edges up in its partition rather than fanning out to every one
+        for index in range(0, len(stale_edge_ids), self.batch_size):
+            self.pipeline.submit(
+                "g.V(vertex_id).has('pk',vertex_pk).bothE().hasId(within(edge_ids)).drop()",
+                {"vertex_id": vertex_id, "vertex_pk": vertex_pk,
+                 "edge_ids": stale_edge_ids[index:index + self.batch_size]},
+            )
+        self.pipeline.drain()
+
+        metrics.increment("cleanup_dropped_total", stale_neighbors, kind="vertex")
+        metrics.increment("cleanup_dropped_total", len(stale_edge_ids), kind="edge")
+        logging.debug(
+            f"Dropped {stale_neighbors} neighbors and {len(stale_edge_ids)} of {len(edge_ids)} edges of {vertex_id}"
+        )
+        if self.pipeline.errors:
+            raise Exception(f"Failed to clean up {vertex_id}: {self.pipeline.errors[0][1]}")
+
+    def submit_vertex_batch(self):
+        batch = self.vertex_batch
+        self.vertex_batch = GremlinBatch(self.timestamp, VERTEX)
+        if not batch.statements:
+            return
+
+        def register_written_vertices(result):
+            logging.debug(f"Upserted batch of {len(batch.statements)}: {result}")
+            if batch.vertex_keys:
+                self.written_vertices.update(dict.fromkeys(batch.vertex_keys, True))
+
+        script, bindings = batch.query(self.batch_size)
+        self.pipeline.submit(script, bindings, register_written_vertices)
+
+    def flush(self):
+        self.submit_vertex_batch()
+        self.pipeline.drain()
+
+        self.hold_edge_batch()
+        for batch in self.edge_batches:
+            self.pipeline.submit(*batch.query(self.batch_size))
+        self.edge_batches = []
+        self.pipeline.drain()
 
 
 def get_vertex(gremlin_client, id, pk):
@@ -218,6 +513,8 @@ def get_vertex(gremlin_client, id, pk):
 )
 def execute_gremlin_query(gremlin_client, query, bindings=None):
     logging.debug(f"Running this Gremlin query: {query} with bindings: {bindings}")
+    metrics.increment("gremlin_requests_total", kind="single")
+    metrics.increment("gremlin_script_requests_total", script=get_script_id(query))
     callback = gremlin_client.submitAsync(query, bindings)
     if callback.result() is None:
         logging.error(f"{query} failed to execute")
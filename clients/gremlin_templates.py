@@ -0,0 +1,178 @@
+import hashlib
+import os
+from functools import lru_cache
+from typing import List
+
+# The scripts GremlinBatchWriter sends are put together from a few fixed statement templates, with every id, key
+# and value in bindings, so the server only ever compiles a small set of scripts. A statement has a number of
+# property slots, a power of two up to a maximum; a vertex with more property values than that takes several
+# statements in a row. A batch is padded with statements that match nothing up to a power of two, and every
+# statement in it gets as many slots as the one that needs the most, so each template is sent in only a few shapes.
+
+# most property values a vertex statement writes; a slot whose key is empty writes nothing
+vertex_property_slots = int(os.environ.setdefault("GREMLIN_VERTEX_PROPERTY_SLOTS", "8"))
+# edges only ever get lastScanned so far
+edge_property_slots = int(os.environ.setdefault("GREMLIN_EDGE_PROPERTY_SLOTS", "1"))
+# most statements in a vertex batch, whatever the writer's batch size: each one comes with its own fold(),
+# coalesce() and slots, which would make a batch of the loader's size a very large script
+vertex_batch_capacity = int(os.environ.setdefault("GREMLIN_VERTEX_BATCH_CAPACITY", "32"))
+
+VERTEX = "vertex"
+EDGE = "edge"
+DROP_VERTEX = "drop_vertex"
+
+
+def get_script_id(script: str) -> str:
+    # short enough for a metric label
+    return hashlib.sha1(script.encode("utf-8")).hexdigest()[:12]
+
+
+def get_vertex_statement(prefix: str, slots: int) -> str:
+    # every value is written with list cardinality; dropping the key first is what makes a value single.
+    # create is false for updates, which must not bring back a vertex dropped in the meantime
+    return (
+        f"__.V({prefix}id).has('pk',{prefix}pk)."
+        f"fold()."
+        f"coalesce(unfold(),"
+        f"where(constant({prefix}create).is(true))."
+        f"addV().property(T.id, {prefix}id).property('pk', {prefix}pk).property('created', timestamp))"
+    ) + "".join(
+        f".sideEffect(properties({prefix}d{slot}).drop())"
+        f".sideEffect(where(constant({prefix}k{slot}).is(neq('')))."
+        f"property(Cardinality.list, {prefix}k{slot}, {prefix}v{slot}))"
+        for slot in range(slots)
+    )
+
+
+def get_edge_statement(prefix: str, slots: int) -> str:
+    # edges live with their source vertex, so look the edge up from there instead of g.E(edge_id),
+    # which can only start a traversal
+    return (
+        f"__.V({prefix}source_id).has('pk', {prefix}source_pk).as('source')."
+        f"coalesce(outE().hasId({prefix}id),"
+        f"V({prefix}destination_id).has('pk', {prefix}destination_pk)."
+        f"addE({prefix}label).from('source').property(T.id, {prefix}id).property('created', timestamp))"
+    ) + "".join(
+        f".sideEffect(where(constant({prefix}k{slot}).is(neq(''))).property({prefix}k{slot}, {prefix}v{slot}))"
+        for slot in range(slots)
+    )
+
+
+def get_drop_vertex_statement(prefix: str, slots: int) -> str:
+    return f"__.V({prefix}id).has('pk',{prefix}pk).drop()"
+
+
+statement_templates = {
+    VERTEX: get_vertex_statement,
+    EDGE: get_edge_statement,
+    DROP_VERTEX: get_drop_vertex_statement,
+}
+
+# the bindings of each slot
+slot_names = {VERTEX: ("d", "k", "v"), EDGE: ("k", "v"), DROP_VERTEX: ()}
+
+# bindings of a padding statement: no vertex has an empty id, so it matches nothing and writes nothing
+padding_statements = {
+    VERTEX: {"id": "", "pk": "", "create": False},
+    EDGE: {"id": "", "source_id": "", "source_pk": "", "destination_id": "", "destination_pk": "", "label": ""},
+    DROP_VERTEX: {"id": "", "pk": ""},
+}
+
+
+def round_up(count: int) -> int:
+    # to a power of two
+    rounded = 1
+    while rounded < count:
+        rounded *= 2
+    return rounded
+
+
+def get_batch_limit(kind: str, batch_size: int) -> int:
+    # most statements the writer puts in a batch of this kind
+    return min(batch_size, vertex_batch_capacity) if kind == VERTEX else batch_size
+
+
+def get_capacity(count: int, limit: int) -> int:
+    # a vertex whose statements alone exceed the limit is sent whole in a batch of its own
+    return max(min(round_up(count), limit), count)
+
+
+def get_used_slots(statement: dict) -> int:
+    slots = 0
+    while f"k{slots}" in statement:
+        slots += 1
+    return slots
+
+
+def get_slot_capacity(statements: List[dict]) -> int:
+    used = max((get_used_slots(statement) for statement in statements), default=0)
+    return round_up(used) if used else 0
+
+
+@lru_cache(maxsize=None)
+def get_batch_script(kind: str, capacity: int, slots: int) -> str:
+    template = statement_templates[kind]
+    return "g.inject(0)" + "".join(f".sideEffect({template(f'b{index}_', slots)})" for index in range(capacity))
+
+
+def get_batch_bindings(kind: str, statements: List[dict], capacity: int, slots: int, timestamp: str) -> dict:
+    bindings = {"timestamp": timestamp}
+    padding = [padding_statements[kind]] * (capacity - len(statements))
+    for index, statement in enumerate(statements + padding):
+        bindings.update({f"b{index}_{name}": value for name, value in statement.items()})
+        # slots a statement does not use write nothing
+        for slot in range(get_used_slots(statement), slots):
+            bindings.update({f"b{index}_{name}{slot}": "" for name in slot_names[kind]})
+    return bindings
+
+
+def get_property_slots(properties: dict, drop_keys) -> List[tuple]:
+    # (drop, key, value) for each value; the first slot of a key in drop_keys drops the values it had before,
+    # an empty list in drop_keys only drops them
+    slots = []
+    for key, value in properties.items():
+        values = value if isinstance(value, list) else [value]
+        drop = key if key in drop_keys else ""
+        if not values:
+            if drop:
+                slots.append((drop, "", ""))
+            continue
+        for index, val in enumerate(values):
+            slots.append((drop if index == 0 else "", key, val))
+    return slots
+
+
+def get_vertex_statements(vertex_id, vertex_pk, properties: dict, create: bool, drop_keys) -> List[dict]:
+    slots = get_property_slots(properties, drop_keys)
+    statements = []
+    for start in range(0, max(len(slots), 1), vertex_property_slots):
+        statement = {"id": vertex_id, "pk": vertex_pk, "create": create and start == 0}
+        for slot, (drop, key, value) in enumerate(slots[start:start + vertex_property_slots]):
+            statement.update({f"d{slot}": drop, f"k{slot}": key, f"v{slot}": value})
+        statements.append(statement)
+    return statements
+
+
+def get_edge_statements(
+        edge_id, edge_label, source_vertex_id, source_vertex_pk, destination_vertex_id, destination_vertex_pk,
+        properties: dict,
+) -> List[dict]:
+    items = list(properties.items())
+    statements = []
+    for start in range(0, max(len(items), 1), edge_property_slots):
+        statement = {
+            "id": edge_id,
+            "label": edge_label,
+            "source_id": source_vertex_id,
+            "source_pk": source_vertex_pk,
+            "destination_id": destination_vertex_id,
+            "destination_pk": destination_vertex_pk,
+        }
+        for slot, (key, value) in enumerate(items[start:start + edge_property_slots]):
+            statement.update({f"k{slot}": key, f"v{slot}": value})
+        statements.append(statement)
+    return statements
+
+
+def get_drop_vertex_statements(vertex_id, vertex_pk) -> List[dict]:
+    return [{"id": vertex_id, "pk": vertex_pk}]
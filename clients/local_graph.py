@@ -0,0 +1,783 @@
+import json
+import re
+import sqlite3
+import threading
+import uuid
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
+
+# An in-process stand-in for the Cosmos Gremlin endpoint. It understands the Gremlin this project sends (upserts
+# built from fold()/coalesce(), the lastScanned cleanups, lookups by id and pk, out()/count() reports, the batched
+# g.inject(0).sideEffect(...) writes) and keeps the graph in SQLite, so every pool worker and every run shares it.
+# With ":memory:" as the path the graph lives and dies with the process.
+
+token_pattern = re.compile(
+    r"\s*(?:(?P<string>'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\")|(?P<number>-?\d+(?:\.\d+)?)"
+    r"|(?P<name>[A-Za-z_][A-Za-z0-9_]*)|(?P<punctuation>[().,]))"
+)
+
+# start steps that may also appear in the middle of a traversal, as Cosmos allows
+start_steps = {"V", "E", "inject"}
+
+
+class Constant:
+    # T.id, T.label, Cardinality.single, ...
+    def __init__(self, namespace: str, name: str) -> None:
+        self.namespace = namespace
+        self.name = name
+
+    def __eq__(self, other):
+        return isinstance(other, Constant) and (self.namespace, self.name) == (other.namespace, other.name)
+
+    def __hash__(self):
+        return hash((self.namespace, self.name))
+
+
+T_ID = Constant("T", "id")
+T_LABEL = Constant("T", "label")
+SINGLE = Constant("Cardinality", "single")
+LIST = Constant("Cardinality", "list")
+
+
+class Predicate:
+    # eq(''), neq(''), within(...), ... as has() and is() take them
+    tests = {
+        "eq": lambda value, args: value == args[0],
+        "neq": lambda value, args: value != args[0],
+        "gt": lambda value, args: value is not None and value > args[0],
+        "gte": lambda value, args: value is not None and value >= args[0],
+        "lt": lambda value, args: value is not None and value < args[0],
+        "lte": lambda value, args: value is not None and value <= args[0],
+        "within": lambda value, args: value in flatten(args),
+        "without": lambda value, args: value not in flatten(args),
+    }
+
+    def __init__(self, name: str, args: list) -> None:
+        self.name = name
+        self.args = args
+
+    def test(self, value) -> bool:
+        return Predicate.tests[self.name](value, self.args)
+
+
+def matches(value, expected) -> bool:
+    if isinstance(expected, Predicate):
+        return expected.test(value)
+    return value == expected
+
+
+class Traversal:
+    def __init__(self, steps: List[tuple]) -> None:
+        # [(name, args, modulators)], modulators being the by()/from()/to() steps that follow a step
+        self.steps = steps
+
+
+class GraphQueryError(Exception):
+    pass
+
+
+def tokenize(query: str) -> List[tuple]:
+    tokens = []
+    position = 0
+    while position < len(query):
+        match = token_pattern.match(query, position)
+        if match is None or match.end() == position:
+            if query[position:].strip() == "":
+                break
+            raise GraphQueryError(f"Unexpected {query[position:position + 20]!r} in {query!r}")
+        position = match.end()
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+    return tokens
+
+
+class Parser:
+    modulator_steps = {"by", "from", "to", "option"}
+
+    def __init__(self, query: str, bindings: Dict[str, Any]) -> None:
+        self.tokens = tokenize(query)
+        self.position = 0
+        self.bindings = bindings
+        self.query = query
+
+    def peek(self, offset: int = 0) -> Optional[tuple]:
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else None
+
+    def take(self, value: str = None) -> tuple:
+        token = self.peek()
+        if token is None or (value is not None and token[1] != value):
+            raise GraphQueryError(f"Expected {value!r} at token {self.position} of {self.query!r}")
+        self.position += 1
+        return token
+
+    def parse(self) -> Traversal:
+        traversal = self.parse_traversal()
+        if self.peek() is not None:
+            raise GraphQueryError(f"Unexpected {self.peek()[1]!r} in {self.query!r}")
+        return traversal
+
+    def parse_traversal(self) -> Traversal:
+        # g.step()..., __.step()... or an anonymous traversal starting straight with a step: unfold()...
+        name = self.take()[1]
+        if name in ("g", "__"):
+            self.take(".")
+            name = self.take()[1]
+
+        steps = []
+        while True:
+            args = self.parse_arguments()
+            if name in self.modulator_steps:
+                if not steps:
+                    raise GraphQueryError(f"{name}() does not follow a step in {self.query!r}")
+                steps[-1][2].append((name, args))
+            else:
+                steps.append((name, args, []))
+
+            if self.peek() is None or self.peek()[1] != ".":
+                return Traversal(steps)
+            self.take(".")
+            name = self.take()[1]
+
+    def parse_arguments(self) -> list:
+        self.take("(")
+        args = []
+        while self.peek() is not None and self.peek()[1] != ")":
+            args.append(self.parse_argument())
+            if self.peek() is not None and self.peek()[1] == ",":
+                self.take(",")
+        self.take(")")
+        return args
+
+    def parse_argument(self):
+        kind, value = self.peek()
+        if kind == "string":
+            self.take()
+            return bytes(value[1:-1], "utf-8").decode("unicode_escape") if "\\" in value else value[1:-1]
+        if kind == "number":
+            self.take()
+            return float(value) if "." in value else int(value)
+
+        following = self.peek(1)
+        if value in Predicate.tests and following is not None and following[1] == "(":
+            self.take()
+            return Predicate(value, self.parse_arguments())
+        if value in ("g", "__") or (following is not None and following[1] == "("):
+            return self.parse_traversal()
+
+        self.take()
+        if following is not None and following[1] == ".":
+            self.take(".")
+            return Constant(value, self.take()[1])
+        if value in self.bindings:
+            return self.bindings[value]
+        if value == "id":
+            return T_ID
+        if value == "label":
+            return T_LABEL
+        if value in ("true", "false"):
+            return value == "true"
+        if value == "null":
+            return None
+        raise GraphQueryError(f"No binding for {value!r} in {self.query!r}")
+
+
+class Vertex:
+    def __init__(self, vertex_id, pk, label, properties) -> None:
+        self.id = vertex_id
+        self.pk = pk
+        self.label = label
+        # key -> list of values
+        self.properties = properties
+        self.stored_key = None
+
+    def key(self):
+        return "vertex", self.id, self.pk
+
+
+class Edge:
+    def __init__(self, edge_id, label, out_key, in_key, properties) -> None:
+        self.id = edge_id
+        self.label = label
+        self.out_key = out_key
+        self.in_key = in_key
+        # key -> value
+        self.properties = properties
+        self.stored_key = None
+
+    def key(self):
+        return "edge", self.id
+
+
+class PropertyReference:
+    def __init__(self, element, key, value) -> None:
+        self.element = element
+        self.key = key
+        self.value = value
+
+
+class Traverser:
+    def __init__(self, obj, path: dict = None) -> None:
+        self.obj = obj
+        self.path = path if path is not None else {}
+
+    def split(self, obj):
+        return Traverser(obj, dict(self.path))
+
+
+# One query's view of the store: elements are loaded once, changed in place and written back by commit().
+class GraphTransaction:
+    def __init__(self, connection: sqlite3.Connection) -> None:
+        self.connection = connection
+        self.elements = {}
+        self.dirty = {}
+        self.dropped = {}
+
+    def row_to_vertex(self, row) -> Vertex:
+        key = ("vertex", row[0], row[1])
+        if key in self.dropped:
+            return None
+        if key not in self.elements:
+            vertex = Vertex(row[0], row[1], row[2], json.loads(row[3]))
+            vertex.stored_key = key
+            self.elements[key] = vertex
+        return self.elements[key]
+
+    def row_to_edge(self, row) -> Edge:
+        key = ("edge", row[0])
+        if key in self.dropped:
+            return None
+        if key not in self.elements:
+            edge = Edge(row[0], row[1], ("vertex", row[2], row[3]), ("vertex", row[4], row[5]), json.loads(row[6]))
+            edge.stored_key = key
+            self.elements[key] = edge
+        return self.elements[key]
+
+    def live(self, elements):
+        return [element for element in elements if element is not None and element.key() not in self.dropped]
+
+    def new_elements(self, element_type):
+        return [
+            element for element in self.dirty.values()
+            if isinstance(element, element_type) and element.stored_key is None
+        ]
+
+    def vertices(self, ids=None) -> List[Vertex]:
+        if ids:
+            rows = []
+            for vertex_id in ids:
+                rows += self.connection.execute("SELECT * FROM vertices WHERE id = ?", (vertex_id,)).fetchall()
+            new = [vertex for vertex in self.new_elements(Vertex) if vertex.id in ids]
+        else:
+            rows = self.connection.execute("SELECT * FROM vertices").fetchall()
+            new = self.new_elements(Vertex)
+        return self.live([self.row_to_vertex(row) for row in rows] + new)
+
+    def vertex(self, key) -> Optional[Vertex]:
+        if key in self.dropped:
+            return None
+        if key in self.elements:
+            return self.elements[key]
+        for vertex in self.new_elements(Vertex):
+            if vertex.key() == key:
+                return vertex
+        row = self.connection.execute("SELECT * FROM vertices WHERE id = ? AND pk = ?", key[1:]).fetchone()
+        return self.row_to_vertex(row) if row else None
+
+    def edges(self, ids=None) -> List[Edge]:
+        if ids:
+            rows = []
+            for edge_id in ids:
+                rows += self.connection.execute("SELECT * FROM edges WHERE id = ?", (edge_id,)).fetchall()
+            new = [edge for edge in self.new_elements(Edge) if edge.id in ids]
+        else:
+            rows = self.connection.execute("SELECT * FROM edges").fetchall()
+            new = self.new_elements(Edge)
+        return self.live([self.row_to_edge(row) for row in rows] + new)
+
+    def incident_edges(self, vertex: Vertex, direction: str) -> List[Edge]:
+        key = vertex.key()
+        rows = []
+        if direction in ("out", "both"):
+            rows += self.connection.execute(
+                "SELECT * FROM edges WHERE out_id = ? AND out_pk = ?", key[1:]
+            ).fetchall()
+        if direction in ("in", "both"):
+            rows += self.connection.execute(
+                "SELECT * FROM edges WHERE in_id = ? AND in_pk = ?", key[1:]
+            ).fetchall()
+        edges = [self.row_to_edge(row) for row in rows]
+        for edge in self.new_elements(Edge):
+            if (direction in ("out", "both") and edge.out_key == key) or \
+                    (direction in ("in", "both") and edge.in_key == key):
+                edges.append(edge)
+
+        unique = {}
+        for edge in self.live(edges):
+            # a stored edge whose ends were changed in this query is only adjacent to its new ends
+            if (direction in ("out", "both") and edge.out_key == key) or \
+                    (direction in ("in", "both") and edge.in_key == key):
+                unique[id(edge)] = edge
+        return list(unique.values())
+
+    def touch(self, element):
+        self.dirty[id(element)] = element
+
+    def drop(self, element):
+        if isinstance(element, Vertex):
+            for edge in self.incident_edges(element, "both"):
+                self.drop(edge)
+        self.dropped[element.key()] = element
+        self.dirty.pop(id(element), None)
+
+    def commit(self):
+        for key, element in self.dropped.items():
+            if element.stored_key is None:
+                continue
+            if isinstance(element, Vertex):
+                self.connection.execute("DELETE FROM vertices WHERE id = ? AND pk = ?", element.stored_key[1:])
+            else:
+                self.connection.execute("DELETE FROM edges WHERE id = ?", element.stored_key[1:])
+
+        for element in self.dirty.values():
+            if isinstance(element, Vertex):
+                if element.stored_key is not None and element.stored_key != element.key():
+                    self.connection.execute("DELETE FROM vertices WHERE id = ? AND pk = ?", element.stored_key[1:])
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO vertices VALUES (?, ?, ?, ?)",
+                    (element.id, element.pk, element.label, json.dumps(element.properties)),
+                )
+            else:
+                if element.stored_key is not None and element.stored_key != element.key():
+                    self.connection.execute("DELETE FROM edges WHERE id = ?", element.stored_key[1:])
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO edges VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (element.id, element.label, *element.out_key[1:], *element.in_key[1:],
+                     json.dumps(element.properties)),
+                )
+
+
+def get_property_values(element, key) -> list:
+    if key == T_ID:
+        return [element.id]
+    if key == T_LABEL:
+        return [element.label]
+    if isinstance(element, Vertex):
+        if key == "pk":
+            return [element.pk]
+        return list(element.properties.get(key, []))
+    if isinstance(element, Edge):
+        return [element.properties[key]] if key in element.properties else []
+    return []
+
+
+class Evaluator:
+    def __init__(self, transaction: GraphTransaction) -> None:
+        self.transaction = transaction
+
+    def run(self, traversal: Traversal, traversers: List[Traverser]) -> List[Traverser]:
+        for name, args, modulators in traversal.steps:
+            step = getattr(self, f"step_{name}", None)
+            if step is None:
+                raise GraphQueryError(f"{name}() is not supported by the local graph")
+            traversers = step(traversers, args, modulators)
+        return traversers
+
+    def run_each(self, traversal: Traversal, traverser: Traverser) -> List[Traverser]:
+        return self.run(traversal, [traverser])
+
+    def value_of(self, traverser: Traverser, argument):
+        # a by()/from() argument: a traversal is evaluated, anything else taken as is
+        if isinstance(argument, Traversal):
+            results = self.run_each(argument, traverser)
+            return results[0].obj if results else None
+        return argument
+
+    # start steps
+
+    def step_V(self, traversers, args, modulators):
+        ids = flatten(args)
+        return [traverser.split(vertex) for traverser in traversers for vertex in self.transaction.vertices(ids)]
+
+    def step_E(self, traversers, args, modulators):
+        ids = flatten(args)
+        return [traverser.split(edge) for traverser in traversers for edge in self.transaction.edges(ids)]
+
+    def step_inject(self, traversers, args, modulators):
+        return [traverser.split(value) for traverser in traversers for value in args]
+
+    # filters
+
+    def step_has(self, traversers, args, modulators):
+        if len(args) == 1:
+            return [traverser for traverser in traversers if get_property_values(traverser.obj, args[0])]
+        if len(args) == 3:
+            label, key, value = args
+            traversers = [traverser for traverser in traversers if getattr(traverser.obj, "label", None) == label]
+        else:
+            key, value = args
+        return [
+            traverser for traverser in traversers
+            if any(matches(stored, value) for stored in get_property_values(traverser.obj, key))
+        ]
+
+    def step_hasId(self, traversers, args, modulators):
+        if len(args) == 1 and isinstance(args[0], Predicate):
+            return [traverser for traverser in traversers if matches(getattr(traverser.obj, "id", None), args[0])]
+        ids = flatten(args)
+        return [traverser for traverser in traversers if getattr(traverser.obj, "id", None) in ids]
+
+    def step_hasLabel(self, traversers, args, modulators):
+        labels = flatten(args)
+        return [traverser for traverser in traversers if getattr(traverser.obj, "label", None) in labels]
+
+    def step_hasNot(self, traversers, args, modulators):
+        return [traverser for traverser in traversers if not get_property_values(traverser.obj, args[0])]
+
+    def step_is(self, traversers, args, modulators):
+        return [traverser for traverser in traversers if matches(traverser.obj, args[0])]
+
+    def step_not(self, traversers, args, modulators):
+        return [traverser for traverser in traversers if not self.run_each(args[0], traverser)]
+
+    def step_where(self, traversers, args, modulators):
+        return [traverser for traverser in traversers if self.run_each(args[0], traverser)]
+
+    def step_dedup(self, traversers, args, modulators):
+        seen = set()
+        unique = []
+        for traverser in traversers:
+            marker = id(traverser.obj) if isinstance(traverser.obj, (Vertex, Edge, dict, list)) else traverser.obj
+            if marker not in seen:
+                seen.add(marker)
+                unique.append(traverser)
+        return unique
+
+    def step_limit(self, traversers, args, modulators):
+        return traversers[:args[0]]
+
+    # navigation
+
+    def adjacent_edges(self, traversers, args, direction):
+        labels = flatten(args)
+        return [
+            traverser.split(edge)
+            for traverser in traversers if isinstance(traverser.obj, Vertex)
+            for edge in self.transaction.incident_edges(traverser.obj, direction)
+            if not labels or edge.label in labels
+        ]
+
+    def adjacent_vertices(self, traversers, args, direction):
+        results = []
+        for edge_traverser in self.adjacent_edges(traversers, args, direction):
+            edge = edge_traverser.obj
+            if direction == "out":
+                ends = [edge.in_key]
+            elif direction == "in":
+                ends = [edge.out_key]
+            else:
+                ends = [edge.in_key, edge.out_key]
+            for end in ends:
+                vertex = self.transaction.vertex(end)
+                if vertex is not None:
+                    results.append(edge_traverser.split(vertex))
+        return results
+
+    def step_outE(self, traversers, args, modulators):
+        return self.adjacent_edges(traversers, args, "out")
+
+    def step_inE(self, traversers, args, modulators):
+        return self.adjacent_edges(traversers, args, "in")
+
+    def step_bothE(self, traversers, args, modulators):
+        return self.adjacent_edges(traversers, args, "both")
+
+    def step_out(self, traversers, args, modulators):
+        return self.adjacent_vertices(traversers, args, "out")
+
+    def step_in(self, traversers, args, modulators):
+        return self.adjacent_vertices(traversers, args, "in")
+
+    def step_both(self, traversers, args, modulators):
+        return self.adjacent_vertices(traversers, args, "both")
+
+    def edge_ends(self, traversers, attribute):
+        results = []
+        for traverser in traversers:
+            vertex = self.transaction.vertex(getattr(traverser.obj, attribute))
+            if vertex is not None:
+                results.append(traverser.split(vertex))
+        return results
+
+    def step_outV(self, traversers, args, modulators):
+        return self.edge_ends(traversers, "out_key")
+
+    def step_inV(self, traversers, args, modulators):
+        return self.edge_ends(traversers, "in_key")
+
+    # branching and side effects
+
+    def step_coalesce(self, traversers, args, modulators):
+        results = []
+        for traverser in traversers:
+            for option in args:
+                option_results = self.run_each(option, traverser)
+                if option_results:
+                    results += option_results
+                    break
+        return results
+
+    def step_sideEffect(self, traversers, args, modulators):
+        for traverser in traversers:
+            self.run_each(args[0], traverser)
+        return traversers
+
+    def step_fold(self, traversers, args, modulators):
+        return [Traverser([traverser.obj for traverser in traversers])]
+
+    def step_unfold(self, traversers, args, modulators):
+        results = []
+        for traverser in traversers:
+            if isinstance(traverser.obj, list):
+                results += [traverser.split(obj) for obj in traverser.obj]
+            elif isinstance(traverser.obj, dict):
+                results += [traverser.split({key: value}) for key, value in traverser.obj.items()]
+            else:
+                results.append(traverser)
+        return results
+
+    def step_as(self, traversers, args, modulators):
+        for traverser in traversers:
+            for label in args:
+                traverser.path[label] = traverser.obj
+        return traversers
+
+    def step_select(self, traversers, args, modulators):
+        if len(args) == 1:
+            return [traverser.split(traverser.path[args[0]]) for traverser in traversers if args[0] in traverser.path]
+        return [traverser.split({label: traverser.path.get(label) for label in args}) for traverser in traversers]
+
+    def step_constant(self, traversers, args, modulators):
+        return [traverser.split(args[0]) for traverser in traversers]
+
+    def step_identity(self, traversers, args, modulators):
+        return traversers
+
+    # values
+
+    def step_id(self, traversers, args, modulators):
+        return [traverser.split(traverser.obj.id) for traverser in traversers]
+
+    def step_label(self, traversers, args, modulators):
+        return [traverser.split(traverser.obj.label) for traverser in traversers]
+
+    def step_values(self, traversers, args, modulators):
+        results = []
+        for traverser in traversers:
+            keys = args or list(traverser.obj.properties)
+            for key in keys:
+                results += [traverser.split(value) for value in get_property_values(traverser.obj, key)]
+        return results
+
+    def step_properties(self, traversers, args, modulators):
+        results = []
+        for traverser in traversers:
+            keys = args or list(traverser.obj.properties)
+            for key in keys:
+                results += [
+                    traverser.split(PropertyReference(traverser.obj, key, value))
+                    for value in get_property_values(traverser.obj, key)
+                ]
+        return results
+
+    def step_valueMap(self, traversers, args, modulators):
+        results = []
+        for traverser in traversers:
+            element = traverser.obj
+            keys = [key for key in args if not isinstance(key, bool)] or list(element.properties)
+            if isinstance(element, Vertex) and not args:
+                keys = ["pk"] + keys
+            values = {}
+            for key in keys:
+                element_values = get_property_values(element, key)
+                if element_values:
+                    values[key] = element_values
+            results.append(traverser.split(values))
+        return results
+
+    def step_project(self, traversers, args, modulators):
+        by_arguments = [modulator_args[0] if modulator_args else None for _, modulator_args in modulators]
+        results = []
+        for traverser in traversers:
+            projection = {}
+            for index, key in enumerate(args):
+                argument = by_arguments[index % len(by_arguments)] if by_arguments else None
+                if argument is None:
+                    projection[key] = traverser.obj
+                elif argument == T_ID:
+                    projection[key] = traverser.obj.id
+                elif argument == T_LABEL:
+                    projection[key] = traverser.obj.label
+                elif isinstance(argument, str):
+                    values = get_property_values(traverser.obj, argument)
+                    projection[key] = values[0] if values else None
+                else:
+                    projection[key] = self.value_of(traverser, argument)
+            results.append(traverser.split(projection))
+        return results
+
+    def step_count(self, traversers, args, modulators):
+        return [Traverser(len(traversers))]
+
+    # writes
+
+    def step_addV(self, traversers, args, modulators):
+        results = []
+        for traverser in traversers:
+            vertex = Vertex(str(uuid.uuid4()), None, args[0] if args else "vertex", {})
+            self.transaction.touch(vertex)
+            results.append(traverser.split(vertex))
+        return results
+
+    def step_addE(self, traversers, args, modulators):
+        results = []
+        for traverser in traversers:
+            ends = {"from": traverser.obj, "to": traverser.obj}
+            for name, modulator_args in modulators:
+                argument = modulator_args[0]
+                ends[name] = traverser.path.get(argument) if isinstance(argument, str) else \
+                    self.value_of(traverser, argument)
+            if not isinstance(ends["from"], Vertex) or not isinstance(ends["to"], Vertex):
+                raise GraphQueryError("addE() needs a vertex at both ends")
+            edge = Edge(str(uuid.uuid4()), args[0] if args else "edge", ends["from"].key(), ends["to"].key(), {})
+            self.transaction.touch(edge)
+            results.append(traverser.split(edge))
+        return results
+
+    def step_property(self, traversers, args, modulators):
+        cardinality = None
+        if isinstance(args[0], Constant) and args[0].namespace == "Cardinality":
+            cardinality, args = args[0], args[1:]
+        key, value = args[0], args[1]
+
+        for traverser in traversers:
+            element = traverser.obj
+            if key == T_ID:
+                element.id = value
+            elif isinstance(element, Vertex) and key == "pk":
+                element.pk = value
+            elif isinstance(element, Vertex):
+                if cardinality == LIST:
+                    element.properties.setdefault(key, []).append(value)
+                else:
+                    element.properties[key] = [value]
+            else:
+                element.properties[key] = value
+            self.transaction.touch(element)
+        return traversers
+
+    def step_drop(self, traversers, args, modulators):
+        for traverser in traversers:
+            obj = traverser.obj
+            if isinstance(obj, PropertyReference):
+                element = obj.element
+                if isinstance(element, Vertex):
+                    values = element.properties.get(obj.key, [])
+                    if obj.value in values:
+                        values.remove(obj.value)
+                    if not values:
+                        element.properties.pop(obj.key, None)
+                else:
+                    element.properties.pop(obj.key, None)
+                self.transaction.touch(element)
+            elif isinstance(obj, (Vertex, Edge)):
+                self.transaction.drop(obj)
+        return []
+
+
+def flatten(args) -> list:
+    values = []
+    for arg in args:
+        values += arg if isinstance(arg, (list, tuple)) else [arg]
+    return values
+
+
+def serialize(obj):
+    # the GraphSON shapes the Cosmos client hands back, as far as this project reads them
+    if isinstance(obj, Vertex):
+        properties = {"pk": [{"id": f"{obj.id}|pk", "value": obj.pk}]}
+        for key, values in obj.properties.items():
+            properties[key] = [{"id": f"{obj.id}|{key}|{index}", "value": value} for index, value in enumerate(values)]
+        return {"id": obj.id, "label": obj.label, "type": "vertex", "properties": properties}
+    if isinstance(obj, Edge):
+        return {
+            "id": obj.id, "label": obj.label, "type": "edge",
+            "outV": obj.out_key[1], "inV": obj.in_key[1], "properties": dict(obj.properties),
+        }
+    if isinstance(obj, PropertyReference):
+        return {"key": obj.key, "value": obj.value}
+    if isinstance(obj, list):
+        return [serialize(item) for item in obj]
+    if isinstance(obj, dict):
+        return {key: serialize(value) for key, value in obj.items()}
+    return obj
+
+
+class LocalResultSet:
+    def __init__(self, result: list) -> None:
+        self.result_list = result
+
+    def all(self):
+        future = Future()
+        future.set_result(self.result_list)
+        return future
+
+
+class LocalGraphClient:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS vertices ("
+            "id TEXT NOT NULL, pk TEXT, label TEXT NOT NULL, properties TEXT NOT NULL, PRIMARY KEY (id, pk))"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS edges ("
+            "id TEXT PRIMARY KEY, label TEXT NOT NULL, out_id TEXT NOT NULL, out_pk TEXT, "
+            "in_id TEXT NOT NULL, in_pk TEXT, properties TEXT NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS edges_out ON edges (out_id, out_pk)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS edges_in ON edges (in_id, in_pk)")
+
+    def execute(self, query: str, bindings: Dict[str, Any] = None) -> list:
+        traversal = Parser(query, bindings or {}).parse()
+        with self.lock:
+            # every query is one transaction, so concurrent workers see each other's upserts whole
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                transaction = GraphTransaction(self.connection)
+                traversers = Evaluator(transaction).run(traversal, [Traverser(None)])
+                transaction.commit()
+                self.connection.execute("COMMIT")
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+
+        return [serialize(traverser.obj) for traverser in traversers]
+
+    def submitAsync(self, query: str, bindings: Dict[str, Any] = None) -> Future:
+        # answered right away; the future only keeps the interface of gremlin_python's client
+        future = Future()
+        try:
+            future.set_result(LocalResultSet(self.execute(query, bindings)))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def submit(self, query: str, bindings: Dict[str, Any] = None):
+        return self.submitAsync(query, bindings).result()
+
+    def close(self):
+        self.connection.close()
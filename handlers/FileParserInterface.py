@@ -1,9 +1,10 @@
 import os
 import re
 
-from typing import List
+from typing import List, Tuple
 
 from model.issue import Issue
+from utils.provenance import FileProvenance
 
 
 class ParserResult:
@@ -30,6 +31,13 @@ class ParserResult:
 
 
 class FileParserInterface:
+    # parsers whose result depends only on the file's content can be served from the parse cache;
+    # bump the version whenever a change to parse() changes what it returns for the same content
+    cacheable = False
+    version = 1
+    # parsers that ask who created their files, see get_creation
+    needs_provenance = False
+
     def __init__(self, file_pattern: str, match_whole_path = False) -> None:
         self.file_pattern = re.compile(file_pattern)
         self.match_whole_path = match_whole_path
@@ -47,6 +55,13 @@ class FileParserInterface:
             file_name = os.path.basename(file_path)
             return self.file_pattern.match(file_name)
 
+    def get_creation(self, file_path: str, state: dict) -> Tuple[str, str]:
+        # author email and ISO date of the commit that created the file, from the provenance shared through state
+        if "provenance" not in state:
+            state["provenance"] = FileProvenance()
+        creation = state["provenance"].get_creation(file_path)
+        return creation if creation else ("missing", "missing")
+
     def create_postcrawl_issues(
         self, repo, dependencies, issues, metadata
     ) -> List[Issue]:
@@ -0,0 +1,96 @@
+import hashlib
+import os
+import re
+from typing import Dict, List, Tuple
+
+from handlers.FileParserInterface import FileParserInterface
+
+
+def combine_patterns(parsers: List[FileParserInterface]):
+    if not parsers:
+        return None
+
+    return re.compile("|".join(f"(?:{parser.file_pattern.pattern})" for parser in parsers))
+
+
+class ParserDispatchIndex:
+    excluded_directories = {".git"}
+    # FileParserInterface.will_parse rejects any path containing this, so whole subtrees can be skipped
+    excluded_marker = "node_modules"
+
+    def __init__(self, parsers: List[FileParserInterface]) -> None:
+        self.parsers = parsers
+        self.basename_parsers = [parser for parser in parsers if not parser.match_whole_path]
+        self.whole_path_parsers = [parser for parser in parsers if parser.match_whole_path]
+        self.basename_pattern = combine_patterns(self.basename_parsers)
+        self.whole_path_pattern = combine_patterns(self.whole_path_parsers)
+        # basename parsers only look at the file name, so the answer for a name never changes
+        self.basename_dispatch = {}
+
+    def parsers_for(self, file_path: str) -> List[FileParserInterface]:
+        if self.excluded_marker in file_path:
+            return []
+
+        file_name = os.path.basename(file_path)
+        matched = self.basename_dispatch.get(file_name)
+        if matched is None:
+            matched = []
+            if self.basename_pattern is not None and self.basename_pattern.match(file_name):
+                matched = [parser for parser in self.basename_parsers if parser.file_pattern.match(file_name)]
+            self.basename_dispatch[file_name] = matched
+
+        if self.whole_path_pattern is not None and self.whole_path_pattern.match(file_path):
+            matched = matched + [parser for parser in self.whole_path_parsers if parser.file_pattern.match(file_path)]
+
+        return matched
+
+    def will_parse(self, file_path: str) -> bool:
+        return len(self.parsers_for(file_path)) > 0
+
+    def fingerprint(self, blobs: Dict[str, str]) -> str:
+        # changes whenever a file some parser would read is added, removed or edited, or a parser changes;
+        # blobs maps paths relative to the repo root to their blob ids, as listed by `git ls-tree`
+        digest = hashlib.sha256()
+        for parser in self.parsers:
+            digest.update(f"{type(parser).__name__}:{parser.version}\n".encode("utf-8"))
+        for path in sorted(blobs):
+            if self.will_parse(f"./{path}"):
+                digest.update(f"{path}\0{blobs[path]}\n".encode("utf-8"))
+
+        return digest.hexdigest()
+
+    def discover(self, root: str = ".") -> List[Tuple[FileParserInterface, List[str]]]:
+        files_by_parser = {id(parser): [] for parser in self.parsers}
+
+        for file_path in self.walk(root):
+            for parser in self.parsers_for(file_path):
+                files_by_parser[id(parser)].append(file_path)
+
+        return [(parser, files_by_parser[id(parser)]) for parser in self.parsers]
+
+    def walk(self, directory: str):
+        # same visiting order as os.walk(top-down): a directory's files first, then its subdirectories
+        try:
+            with os.scandir(directory) as entries:
+                entries = list(entries)
+        except OSError:
+            return
+
+        subdirectories = []
+        for entry in entries:
+            try:
+                is_directory = entry.is_dir()
+            except OSError:
+                is_directory = False
+
+            if is_directory:
+                if entry.name in self.excluded_directories or self.excluded_marker in entry.name:
+                    continue
+                # os.walk does not follow symlinked directories either
+                if not entry.is_symlink():
+                    subdirectories.append(entry.path)
+            else:
+                yield entry.path
+
+        for subdirectory in subdirectories:
+            yield from self.walk(subdirectory)
@@ -5,6 +5,7 @@ from utils.utils import read_file_into_string
 
 
 class DockerFileParser(FileParserInterface):
+    cacheable = True
     docker_pattern = re.compile("\s*from\s*(\S+)", re.IGNORECASE)
 
     def __init__(self) -> None:
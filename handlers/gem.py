@@ -5,6 +5,7 @@ from utils.utils import read_file_into_string
 
 
 class GemFileParser(FileParserInterface):
+    cacheable = True
     gem_pattern = re.compile("\s*(.*) \(.*\)")
 
     def __init__(self) -> None:
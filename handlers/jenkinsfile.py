@@ -5,6 +5,7 @@ from utils.utils import read_file_into_string, prefix_var
 
 
 class JenkinsFileParser(FileParserInterface):
+    cacheable = True
     gl_pattern = "gl[A-Z\\d][A-Za-z\\d]*"
 
     def __init__(self) -> None:
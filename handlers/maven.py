@@ -6,6 +6,8 @@ from utils.utils import listify, read_file_into_string
 
 
 class MavenFileParser(FileParserInterface):
+    cacheable = True
+
     def __init__(self) -> None:
         super().__init__("pom.xml")
 
@@ -5,6 +5,8 @@ from utils.utils import read_file_into_string
 
 
 class NpmFileParser(FileParserInterface):
+    cacheable = True
+
     def __init__(self) -> None:
         super().__init__("package.json")
 
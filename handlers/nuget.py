@@ -7,6 +7,8 @@ from utils.utils import listify, read_file_into_string
 
 
 class NugetFileParser(FileParserInterface):
+    cacheable = True
+
     def __init__(self) -> None:
         super().__init__(".*[.]csproj$")
 
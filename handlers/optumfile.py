@@ -1,7 +1,6 @@
 import functools
 import logging
 import re
-import subprocess
 from typing import List
 
 from handlers.FileParserInterface import FileParserInterface, ParserResult
@@ -10,6 +9,7 @@ import yaml
 
 
 class OrgfileParser(FileParserInterface):
+    needs_provenance = True
 
     accepted_component_types = ["code", "database", "db", "infrastructure", "config", "policy", "iac", "other", "docs"]
     accepted_askId_regexes = ("^poc$", "^POC$", "^UHGWM110-\d{6}$", "^AIDE_\d+$")
@@ -83,11 +83,7 @@ class OrgfileParser(FileParserInterface):
 
     def parse(self, file_path: str, state: dict) -> ParserResult:
 
-        # use 'git' to pull info on who created the Orgfile
-        output = subprocess.check_output(["git", "log", "--follow", '--format="%ae|%aI"', "--", file_path])
-
-        # we need to pull the last entry from the output and split it on the pipe
-        output_parts = output.decode('UTF-8').strip().replace('"', '').split("\n")[-1].strip().split('|')
+        author, created_date = self.get_creation(file_path, state)
         valid_Orgfile, Orgfile = self.check_Orgfile(file_path)
 
         logging.info(f"{file_path} is valid Orgfile: {valid_Orgfile}")
@@ -105,8 +101,8 @@ class OrgfileParser(FileParserInterface):
         return ParserResult("Orgfile", metadata={
             self.has_Orgfile_field: True,
             self.has_valid_Orgfile_field: valid_Orgfile,
-            self.Orgfile_author_field: output_parts[0],
-            self.Orgfile_created_date_field: output_parts[1],
+            self.Orgfile_author_field: author,
+            self.Orgfile_created_date_field: created_date,
             self.Orgfile_ask_id: str(Orgfile['metadata']['askId']) if has_ask_id else "missing",
             self.Orgfile_ca_agile_id: str(Orgfile['metadata']['caAgileId']) if has_ca_agile_id else "missing",
             self.Orgfile_project_friendly_name: str(Orgfile['metadata']['projectFriendlyName']) if has_project_friendly_name else "missing",
@@ -5,6 +5,7 @@ from utils.utils import read_file_into_string
 
 
 class PipFileParser(FileParserInterface):
+    cacheable = True
     requirements_pattern = re.compile("^(.+?)(==(.*))?$")
 
     def __init__(self) -> None:
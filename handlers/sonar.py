@@ -7,6 +7,7 @@ import requests
 from requests.auth import HTTPBasicAuth
 
 from handlers.FileParserInterface import FileParserInterface, ParserResult
+from utils.metrics import metrics
 
 
 class SonarParser(FileParserInterface):
@@ -24,28 +25,33 @@ class SonarParser(FileParserInterface):
     def parse(self, file_path: str, state: dict) -> ParserResult:
         metadata = state.get("sonar_data", {})
         if not metadata:
-            key = state.get("sonar_key")
-            metadata.update(self.get_sonar_measures(key))
-            if metadata.get("existsInSonar"):
-                metadata.update(self.get_sonar_quality_gate(key))
-
+            metadata.update(self.get_metadata(state.get("sonar_key")))
             state["sonar_data"] = metadata
 
         return ParserResult("Sonar", metadata=metadata)
 
+    def get_metadata(self, key: str) -> dict:
+        # measures and quality gate of a project, which also change with commits that touch no file of the repo
+        # this parser reads
+        metadata = self.get_sonar_measures(key)
+        if metadata.get(self.exists_in_sonar):
+            metadata.update(self.get_sonar_quality_gate(key))
+        return metadata
+
     def get_sonar_measures(self, component_key: str) -> dict:
 
         if not component_key or component_key == "missing":
             return self.create_default_metadata()
 
-        response = requests.get(
-            url="https://sonar.Org.com/api/measures/component",
-            params={"component": component_key,
-                    "metricKeys": "line_coverage,blocker_violations,critical_violations,lines_to_cover"},
-            headers={"Content-Type": "application/x-www-form-urlencoded",
-                     "Accept": "application/json"},
-            auth=HTTPBasicAuth(os.environ.get("SONAR_TOKEN"), "")
-        )
+        with metrics.time("sonar_request_seconds", endpoint="measures"):
+            response = requests.get(
+                url="https://sonar.Org.com/api/measures/component",
+                params={"component": component_key,
+                        "metricKeys": "line_coverage,blocker_violations,critical_violations,lines_to_cover"},
+                headers={"Content-Type": "application/x-www-form-urlencoded",
+                         "Accept": "application/json"},
+                auth=HTTPBasicAuth(os.environ.get("SONAR_TOKEN"), "")
+            )
 
         # handle the case where the component_key is not found
         if response.status_code == 404:
@@ -56,15 +62,15 @@ class SonarParser(FileParserInterface):
         # raise exception for any other non-200 response
         response.raise_for_status()
 
-        metrics = {o["metric"]: o["value"] for o in response.json()["component"]["measures"] if
+        measures = {o["metric"]: o["value"] for o in response.json()["component"]["measures"] if
                    o.get("value") is not None}
 
         return {
             self.exists_in_sonar: True,
-            self.sonar_blocker_violations: str(metrics["blocker_violations"]) if "blocker_violations" in metrics else "missing",
-            self.sonar_critical_violations: str(metrics["critical_violations"]) if "critical_violations" in metrics else "missing",
-            self.sonar_line_coverage: str(metrics["line_coverage"]) if "line_coverage" in metrics else "missing",
-            self.sonar_lines_to_cover: str(metrics["lines_to_cover"]) if "lines_to_cover" in metrics else "missing"
+            self.sonar_blocker_violations: str(measures["blocker_violations"]) if "blocker_violations" in measures else "missing",
+            self.sonar_critical_violations: str(measures["critical_violations"]) if "critical_violations" in measures else "missing",
+            self.sonar_line_coverage: str(measures["line_coverage"]) if "line_coverage" in measures else "missing",
+            self.sonar_lines_to_cover: str(measures["lines_to_cover"]) if "lines_to_cover" in measures else "missing"
         }
 
     def get_sonar_quality_gate(self, project_key: str) -> dict:
@@ -72,13 +78,14 @@ class SonarParser(FileParserInterface):
         if not project_key or project_key == "missing":
             return self.create_default_metadata()
 
-        response = requests.get(
-            url="https://sonar.Org.com/api/qualitygates/get_by_project",
-            params={"project": project_key},
-            headers={"Content-Type": "application/x-www-form-urlencoded",
-                     "Accept": "application/json"},
-            auth=HTTPBasicAuth(os.environ.get("SONAR_TOKEN"), "")
-        )
+        with metrics.time("sonar_request_seconds", endpoint="quality_gate"):
+            response = requests.get(
+                url="https://sonar.Org.com/api/qualitygates/get_by_project",
+                params={"project": project_key},
+                headers={"Content-Type": "application/x-www-form-urlencoded",
+                         "Accept": "application/json"},
+                auth=HTTPBasicAuth(os.environ.get("SONAR_TOKEN"), "")
+            )
 
         # handle the case where the project_key is not found
         if response.status_code == 404:
@@ -1,7 +1,6 @@
 import functools
 import logging
 import re
-import subprocess
 from typing import List
 
 from handlers.FileParserInterface import FileParserInterface, ParserResult
@@ -10,6 +9,7 @@ import yaml
 
 
 class VitalsFileParser(FileParserInterface):
+    needs_provenance = True
     accepted_apiVersions = ["v1"]
     accepted_component_types = ["code", "database", "db", "infrastructure", "config", "policy", "iac", "other", "docs"]
     accepted_askId_regexes = ("^poc$", "^POC$", "^UHGWM110-\d{6}$", "^AIDE_\d+$", "null")
@@ -116,11 +116,7 @@ class VitalsFileParser(FileParserInterface):
 
     def parse(self, file_path: str, state: dict) -> ParserResult:
 
-        # use 'git' to pull info on who created the vitals.yaml
-        output = subprocess.check_output(["git", "log", "--follow", '--format="%ae|%aI"', "--", file_path])
-
-        # we need to pull the last entry from the output and split it on the pipe
-        output_parts = output.decode('UTF-8').strip().replace('"', '').split("\n")[-1].strip().split('|')
+        author, created_date = self.get_creation(file_path, state)
         valid_vitals, vitals = self.check_vitals(file_path)
 
         logging.info(f"{file_path} is valid vitals.yaml: {valid_vitals}")
@@ -137,8 +133,8 @@ class VitalsFileParser(FileParserInterface):
         return ParserResult("Vitals", metadata={
             self.has_vitals_field: True,
             self.has_valid_vitals_field: valid_vitals,
-            self.vitals_author_field: output_parts[0],
-            self.vitals_created_date_field: output_parts[1],
+            self.vitals_author_field: author,
+            self.vitals_created_date_field: created_date,
             self.vitals_ask_id: str(vitals['metadata']['askId']) if has_ask_id else "missing",
             self.vitals_ca_agile_id: str(vitals['metadata']['caAgileId']) if has_ca_agile_id else "missing",
             self.vitals_project_friendly_name: str(vitals['metadata']['projectFriendlyName']) if has_project_friendly_name else "missing",
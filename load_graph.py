@@ -0,0 +1,181 @@
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import json
+import logging
+import os
+import sys
+from multiprocessing import Pool
+from time import time
+
+from clients.bulk_export import (
+    KIND_EDGES,
+    KIND_UPDATES,
+    KIND_VERTICES,
+    bulk_export_path,
+    kinds,
+    list_partitions,
+    loaded_file_name,
+    read_records,
+    read_run,
+    run_file_name,
+)
+from clients.gremlin import GremlinBatchWriter, get_edge_id, gremlin
+
+# Applies the runs Dependency.py exported with GRAPH_SINK=bulk to the graph:
+#
+#   python load_graph.py [run directory ...]
+#
+# Without arguments every run below BULK_EXPORT_PATH that was not loaded yet is applied, oldest first. A run is
+# loaded in three passes over its partitions, vertices, then edges, then property updates and cleanups, each pass
+# spread over NUMBER_OF_PROCESSES workers that own whole partitions so no two of them write the same pk.
+
+logging.basicConfig(
+    format="%(process)s %(asctime)s %(levelname)-8s %(message)s",
+    level=logging.INFO,
+    datefmt="%Y-%m-%d %H:%M:%S",
+    stream=sys.stdout
+)
+
+number_of_processes = int(os.environ.setdefault("NUMBER_OF_PROCESSES", "12"))
+# upserts per request; the loader does nothing but write, so it can afford larger batches than the crawler
+load_batch_size = int(os.environ.setdefault("LOAD_BATCH_SIZE", "100"))
+
+gremlin_client = None
+
+
+def initialize_worker():
+    global gremlin_client
+    logging.info("Initializing worker clients")
+    gremlin_client = gremlin()
+
+
+def load_vertices(writer, records):
+    # a vertex written several times in a run (the repository before and after its scan, a library by every
+    # repo referencing it) is upserted once with all of its properties
+    vertices = {}
+    for record in records:
+        vertices.setdefault((record["id"], record["pk"]), {}).update(record["properties"])
+    for (vertex_id, vertex_pk), properties in vertices.items():
+        writer.upsert_vertex(vertex_id, vertex_pk, properties)
+    writer.flush()
+
+
+def load_edges(writer, records):
+    edges = {}
+    for record in records:
+        edge_id = get_edge_id(
+            record["source_vertex_id"],
+            record["source_vertex_pk"],
+            record["destination_vertex_id"],
+            record["destination_vertex_pk"],
+        )
+        if edge_id in edges:
+            edges[edge_id]["properties"].update(record["properties"])
+        else:
+            edges[edge_id] = record
+    for record in edges.values():
+        writer.upsert_edge(
+            record["label"],
+            record["source_vertex_id"],
+            record["source_vertex_pk"],
+            record["destination_vertex_id"],
+            record["destination_vertex_pk"],
+            record["properties"],
+        )
+    writer.flush()
+
+
+def load_updates(writer, records):
+    properties = {}
+    cleanups = {}
+    for record in records:
+        if record["op"] == "property":
+            properties[(record["id"], record["pk"], record["key"])] = record["value"]
+        elif record["op"] == "cleanup":
+            cleanups.setdefault((record["id"], record["pk"]), set()).update(record["neighbor_labels"])
+        else:
+            raise ValueError(f"Unknown update {record['op']}")
+
+    for (vertex_id, vertex_pk, key), value in properties.items():
+        writer.set_property(vertex_id, vertex_pk, key, value)
+    writer.flush()
+    if writer.errors:
+        return
+
+    for (vertex_id, vertex_pk), neighbor_labels in cleanups.items():
+        # this writer did not write the vertex's edges, only their lastScanned can tell which are stale
+        writer.cleanup_stale(vertex_id, vertex_pk, sorted(neighbor_labels), mode="timestamp")
+
+
+loaders = {KIND_VERTICES: load_vertices, KIND_EDGES: load_edges, KIND_UPDATES: load_updates}
+
+
+def worker(task):
+    kind, partition, file_paths, timestamp = task
+    writer = GremlinBatchWriter(gremlin_client, timestamp, batch_size=load_batch_size)
+    try:
+        loaders[kind](writer, read_records(file_paths))
+    except Exception as e:
+        logging.exception(f"Failed to load {kind} partition {partition}", e)
+        return kind, partition, writer.upserts, str(e)
+
+    if writer.errors:
+        return kind, partition, writer.upserts, f"{len(writer.errors)} batches failed: {writer.errors[0][1]}"
+    logging.info(f"Loaded {kind} partition {partition}: {writer.upserts} writes in {writer.round_trips} round trips")
+    return kind, partition, writer.upserts, None
+
+
+def load_run(pool, run_path) -> bool:
+    timestamp = read_run(run_path)["timestamp"]
+    partitions = list_partitions(run_path)
+    logging.info(f"Loading run {timestamp} from {run_path}")
+
+    start_time = time()
+    writes = 0
+    for kind in kinds:
+        tasks = [(kind, partition, file_paths, timestamp) for partition, file_paths in partitions[kind].items()]
+        failed = []
+        for _, partition, upserts, error in pool.imap_unordered(worker, tasks):
+            writes += upserts
+            if error is not None:
+                logging.error(f"{kind} partition {partition} of {run_path} failed: {error}")
+                failed.append(partition)
+        if failed:
+            # edges need their vertices, and a cleanup would drop whatever failed to be refreshed
+            logging.error(f"Stopping after {len(failed)} failed {kind} partitions, load {run_path} again to retry")
+            return False
+
+    with open(os.path.join(run_path, loaded_file_name), "w") as file:
+        json.dump({"loaded": time(), "writes": writes}, file)
+    logging.info(f"Loaded run {timestamp} with {writes} writes in {time() - start_time} seconds")
+    return True
+
+
+def list_unloaded_runs(path):
+    if not os.path.isdir(path):
+        return []
+    run_paths = [os.path.join(path, name) for name in sorted(os.listdir(path))]
+    return [
+        run_path for run_path in run_paths
+        if os.path.isfile(os.path.join(run_path, run_file_name))
+        and not os.path.isfile(os.path.join(run_path, loaded_file_name))
+    ]
+
+
+def main():
+    run_paths = sys.argv[1:] or list_unloaded_runs(bulk_export_path)
+    if not run_paths:
+        logging.info(f"Nothing to load in {bulk_export_path}")
+        return
+
+    with Pool(processes=number_of_processes, initializer=initialize_worker) as pool:
+        for run_path in run_paths:
+            # runs are applied in order, a later run's cleanup must not come before an earlier run's writes
+            if not load_run(pool, run_path):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
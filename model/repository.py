@@ -0,0 +1,29 @@
+class RepositoryOwner:
+    def __init__(self, login: str):
+        self.login = login
+
+
+class RepositorySummary:
+    def __init__(
+        self,
+        owner: str,
+        name: str,
+        url: str,
+        private: bool,
+        archived: bool,
+        fork: bool,
+        size: int,
+        head_hash: str,
+    ):
+        # mirrors the subset of github.Repository.Repository the crawler reads
+        self.owner = RepositoryOwner(owner)
+        self.name = name
+        self.url = url
+        self.html_url = url
+        self.private = private
+        self.archived = archived
+        self.fork = fork
+        self.size = size
+        self.head_hash = head_hash
+        # set by the scan planner to override FORCE_SCAN for this repo
+        self.force_scan = None
@@ -7,28 +7,37 @@ load_dotenv()
 import logging
 import os
 import sys
+import tempfile
 import arrow
 
 from dateutil import parser
 from multiprocessing import Pool
 from time import time
-from clients.github import get_all_orgs, get_all_repos_gql
+from clients.github import get_all_orgs, iter_all_repos_gql
 from clients.gremlin import (
     upsert_gremlin_vertex,
     gremlin
 )
+from utils.run_journal import STATUS_COMPLETED, STATUS_FAILED, RunJournal, pop_resume_argument
+from utils.scheduler import round_robin
 
 gremlin_client = None
-total_repos = None
 
 graph_github_base_url = "https://github.com/api/graphql"
 token = os.environ["GITHUB_API_TOKEN"]
 
+# `--resume <run-id>` has to go before anything counts the positional org and repo arguments
+resume_run_id = pop_resume_argument(sys.argv)
+
 number_of_processes = int(os.environ.setdefault("NUMBER_OF_PROCESSES", "12")) if len(sys.argv) == 1 else 1
 force_scan = os.environ.setdefault('FORCE_SCAN', 'False') == 'True' or len(sys.argv) > 2
 
 timestamp = str(arrow.utcnow())
 
+run_journal_path = os.environ.setdefault(
+    "RUN_JOURNAL_PATH", os.path.join(tempfile.gettempdir(), "Dependency-runs.sqlite")
+)
+
 
 logging.basicConfig(
     format="%(process)s %(asctime)s %(levelname)-8s %(message)s",
@@ -43,7 +52,7 @@ def upsert_repository(repo, repo_metadata=None):
         repo_metadata = {}
 
     try:
-        repo_id = repo["nameWithOwner"].replace("/", ".")
+        repo_id = get_repo_id(repo)
         repo_pk = f"repository.{repo_id}"
 
         upsert_gremlin_vertex(
@@ -129,6 +138,10 @@ def handle_repo(repo):
     upsert_repository(repo, repo_metadata)
 
 
+def get_repo_id(repo: dict) -> str:
+    return repo["nameWithOwner"].replace("/", ".")
+
+
 def worker(repo: dict):
 
     try:
@@ -143,49 +156,62 @@ def worker(repo: dict):
 
     except Exception as e:
         logging.exception(f"Failed to process {repo['url']}", e)
+        return get_repo_id(repo), STATUS_FAILED
+
+    return get_repo_id(repo), STATUS_COMPLETED
 
 
-def initialize_worker():
+def initialize_worker(run_timestamp):
     global gremlin_client
+    global timestamp
     logging.info("Initializing worker clients")
     gremlin_client = gremlin()
+    timestamp = run_timestamp
     os.system("git config --global http.postBuffer 2M")
 
 
+def iter_org_repos(org, count, total_orgs):
+    logging.info(f"processing {org.login} - {count}/{total_orgs}")
+    yield from iter_all_repos_gql(org)
+
+
 def main():
     global gremlin_client
+    global timestamp
+    start_time = time()
 
     gremlin_client = gremlin()
     logging.info("initialized gremlin client")
     logging.info("initialized sql cosmosdb client")
 
     all_orgs = get_all_orgs()
+    total_orgs = len(all_orgs)
 
     logging.info(f"using {number_of_processes} processes")
-    count = 1
-    total_orgs = len(all_orgs)
+    org_repos = [iter_org_repos(org, count, total_orgs) for count, org in enumerate(all_orgs, start=1)]
+
+    journal = RunJournal(run_journal_path)
+    if resume_run_id:
+        timestamp = journal.resume_run(resume_run_id, "orthus")
+    else:
+        journal.start_run("orthus", timestamp)
+
+    processed_repos = 0
     with Pool(
-            processes=number_of_processes, initializer=initialize_worker, maxtasksperchild=50
+            processes=number_of_processes, initializer=initialize_worker, initargs=(timestamp,), maxtasksperchild=50
     ) as pool:
-        for org in all_orgs:
-            try:
-                org_start_time = time()
-                global total_repos
-                logging.info(f"processing {org.login} - {count}/{total_orgs}")
-
-                # copy all the repos, so we don't have to keep doing paginated queries
-                repos = get_all_repos_gql(org)
-
-                total_repos = len(repos)
-                logging.info(f"total repositories to process: {total_repos}")
-                pool.map(worker, repos)
-
-                logging.info(f"Took %s seconds to process {org.login}", time() - org_start_time)
-                gremlin_client.close()
-                gremlin_client = gremlin()
-                count += 1
-            except Exception as e:
-                logging.error(f"got error when processing {org.login} %s", e)
+        # repos from every org share one stream, taken from each org in turn, so no org waits on another to finish
+        work = journal.iter_unfinished(round_robin(org_repos), get_repo_id)
+        for repo_id, status in pool.imap_unordered(worker, work):
+            journal.mark(repo_id, status)
+            processed_repos += 1
+            if processed_repos % 100 == 0:
+                logging.info(f"processed {processed_repos} repositories in {time() - start_time} seconds")
+
+    journal.finish_run()
+    journal.close()
+
+    logging.info("Took %s seconds to process all repos", time() - start_time)
 
 
 if __name__ == "__main__":
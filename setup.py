@@ -12,5 +12,5 @@ setup(
     author="Alex Aavang",
     author_email="alexander.aavang@.com",
     url="https://github.com/praveen1664/Dependency-crawler.git",
-    packages=find_packages(exclude=("tests", "docs")),
+    packages=find_packages(exclude=("tests", "docs", "benchmarks")),
 )
@@ -0,0 +1,195 @@
+import os
+import re
+import unittest
+import urllib.parse
+
+from parameterized import parameterized
+
+os.environ.setdefault("COSMOS_GRAPH_PRIMARY_KEY", "unused")
+
+from clients.gremlin import (  # noqa: E402
+    GremlinBatchWriter,
+    execute_gremlin_query,
+    get_technologies,
+    get_vertex,
+    get_vertex_properties,
+)
+from clients.local_graph import LocalGraphClient  # noqa: E402
+
+org_id, org_pk = "github-organization.acme", "github-organization"
+repo_id, repo_pk = "acme.app", "repository.acme.app"
+
+
+def query(graph, gremlin_query, bindings=None):
+    return execute_gremlin_query(graph, gremlin_query, bindings)
+
+
+def scan(graph, timestamp, libraries, issues, mode="timestamp", batch_size=2, repo_properties=None):
+    # what update_cosmos_graph writes for a repo, then its cleanup
+    writer = GremlinBatchWriter(graph, timestamp, batch_size=batch_size)
+    writer.upsert_vertex(org_id, org_pk, {"name": "acme", "type": "organization"})
+    writer.upsert_vertex(repo_id, repo_pk, {"name": "app", "type": "repository", **(repo_properties or {})})
+    writer.upsert_edge("is github org for", org_id, org_pk, repo_id, repo_pk, {})
+    writer.upsert_edge("is in github org", repo_id, repo_pk, org_id, org_pk, {})
+    for library in libraries:
+        library_pk = f"library.{library}"
+        writer.upsert_vertex(library, library_pk, {"name": library, "type": "library"}, once=True)
+        writer.upsert_edge("references", repo_id, repo_pk, library, library_pk, {"version": "1.0"})
+        writer.upsert_edge("is referenced by", library, library_pk, repo_id, repo_pk, {})
+    for issue in issues:
+        writer.upsert_vertex(issue, issue, {"type": "issue", "title": issue})
+        writer.upsert_edge("has issue", repo_id, repo_pk, issue, issue, {})
+        writer.upsert_edge("found in repo", issue, issue, repo_id, repo_pk, {})
+    writer.flush()
+    if writer.errors:
+        raise Exception(f"Failed to write {len(writer.errors)} Gremlin batches: {writer.errors[0][1]}")
+    writer.cleanup_stale(repo_id, repo_pk, ["has issue"], mode=mode)
+    return writer
+
+
+def get_edge_labels(graph):
+    return sorted((edge["label"], edge["outV"], edge["inV"]) for edge in query(graph, "g.E()"))
+
+
+def get_vertex_ids(graph):
+    return sorted(vertex["id"] for vertex in query(graph, "g.V()"))
+
+
+class LocalGraphTest(unittest.TestCase):
+    def setUp(self):
+        self.graph = LocalGraphClient(":memory:")
+
+    def test_batched_upserts(self):
+        writer = scan(
+            self.graph, "2024-01-01", ["left-pad", "lodash", "react"], ["missing readme"],
+            repo_properties={"languages": ["JavaScript", "Python"], "isPrivate": True, "branchCount": 3},
+        )
+
+        # more statements than fit one batch of two, and batches padded up to their script's capacity
+        self.assertGreater(writer.round_trips, 2)
+        self.assertEqual(
+            get_vertex_ids(self.graph), sorted([org_id, repo_id, "left-pad", "lodash", "react", "missing readme"])
+        )
+        self.assertEqual(len(get_edge_labels(self.graph)), 2 + 2 * 3 + 2)
+
+        properties = get_vertex_properties(get_vertex(self.graph, repo_id, repo_pk))
+        self.assertEqual(properties["languages"], ["JavaScript", "Python"])
+        self.assertEqual(properties["isPrivate"], [True])
+        self.assertEqual(properties["branchCount"], [3])
+        self.assertEqual(properties["lastScanned"], ["2024-01-01"])
+        self.assertEqual(properties["pk"], [repo_pk])
+
+        edges = query(self.graph, "g.V(vertex_id).has('pk',vertex_pk).outE(label)", {
+            "vertex_id": repo_id, "vertex_pk": repo_pk, "label": "references",
+        })
+        self.assertEqual({edge["properties"]["version"] for edge in edges}, {"1.0"})
+        self.assertEqual({edge["properties"]["lastScanned"] for edge in edges}, {"2024-01-01"})
+
+    def test_upsert_with_stored_properties_writes_only_changes(self):
+        scan(self.graph, "2024-01-01", [], [], repo_properties={"languages": ["JavaScript", "Python"], "hash": "a"})
+        stored_properties = get_vertex_properties(get_vertex(self.graph, repo_id, repo_pk))
+
+        writer = GremlinBatchWriter(self.graph, "2024-01-01")
+        writer.upsert_vertex(repo_id, repo_pk, {"languages": ["JavaScript", "Python"], "hash": "a"},
+                             stored_properties=stored_properties)
+        writer.flush()
+        self.assertEqual(writer.round_trips, 0)
+
+        writer = GremlinBatchWriter(self.graph, "2024-01-02")
+        writer.upsert_vertex(repo_id, repo_pk, {"languages": ["Python", "Go"], "hash": "b"},
+                             stored_properties=stored_properties)
+        writer.flush()
+        self.assertEqual(writer.errors, [])
+
+        properties = get_vertex_properties(get_vertex(self.graph, repo_id, repo_pk))
+        self.assertEqual(properties["languages"], ["Python", "Go"])
+        self.assertEqual(properties["hash"], ["b"])
+        self.assertEqual(properties["lastScanned"], ["2024-01-02"])
+        self.assertEqual(properties["name"], ["app"])
+        self.assertEqual(stored_properties, properties)
+
+    def test_upsert_once_skips_vertices_already_written(self):
+        written_vertices = {}
+        for ranking in ["first", "second"]:
+            writer = GremlinBatchWriter(self.graph, "2024-01-01", written_vertices=written_vertices)
+            writer.upsert_vertex("react", "library.react", {"name": "react", "ranking": ranking}, once=True)
+            writer.flush()
+
+        self.assertEqual(writer.skipped_upserts, 1)
+        self.assertEqual(get_vertex_properties(get_vertex(self.graph, "react", "library.react"))["ranking"], ["first"])
+
+    def test_set_property_keeps_last_scanned(self):
+        scan(self.graph, "2024-01-01", [], [])
+
+        writer = GremlinBatchWriter(self.graph, "2024-01-02")
+        writer.set_property(repo_id, repo_pk, "resultDigest", "abc")
+        writer.flush()
+
+        properties = get_vertex_properties(get_vertex(self.graph, repo_id, repo_pk))
+        self.assertEqual(properties["resultDigest"], ["abc"])
+        self.assertEqual(properties["lastScanned"], ["2024-01-01"])
+
+    @parameterized.expand(["timestamp", "diff"])
+    def test_cleanup_drops_what_the_scan_did_not_refresh(self, mode):
+        scan(self.graph, "2024-01-01", ["a", "b", "c"], ["i1", "i2", "i3"], mode=mode)
+        scan(self.graph, "2024-01-02", ["a", "d"], ["i2"], mode=mode)
+
+        # libraries are shared by repos and stay, issues belong to the repo and go with their edges
+        self.assertEqual(get_vertex_ids(self.graph), sorted([org_id, repo_id, "a", "b", "c", "d", "i2"]))
+        self.assertEqual(get_edge_labels(self.graph), sorted([
+            ("is github org for", org_id, repo_id),
+            ("is in github org", repo_id, org_id),
+            ("references", repo_id, "a"),
+            ("references", repo_id, "d"),
+            ("is referenced by", "a", repo_id),
+            ("is referenced by", "d", repo_id),
+            ("has issue", repo_id, "i2"),
+            ("found in repo", "i2", repo_id),
+        ]))
+
+    def test_get_technologies(self):
+        writer = GremlinBatchWriter(self.graph, "2024-01-01")
+        writer.upsert_vertex("technology.React", "technology", {
+            "type": "technology", "name": "React",
+            "regexes": [urllib.parse.quote(r"^react$", safe=""), urllib.parse.quote(r"^react-.*", safe="")],
+        })
+        writer.upsert_vertex("react", "library.react", {"type": "library", "name": "react"})
+        writer.flush()
+
+        self.assertEqual(get_technologies(self.graph), [{
+            "id": "technology.React", "pk": "technology", "regexes": [re.compile(r"^react$"), re.compile(r"^react-.*")],
+        }])
+
+    def test_report_queries(self):
+        scan(self.graph, "2024-01-01", [], [], repo_properties={"hasValidfile": True, "isPrivate": False})
+        writer = GremlinBatchWriter(self.graph, "2024-01-01")
+        for name, properties in [("lib", {"hasValidfile": False, "isPrivate": True}), ("docs", {"isPrivate": False})]:
+            writer.upsert_vertex(f"acme.{name}", f"repository.acme.{name}", {"name": name, **properties})
+            writer.upsert_edge("is github org for", org_id, org_pk, f"acme.{name}", f"repository.acme.{name}", {})
+        writer.flush()
+
+        for gremlin_query, count in [
+            ("g.V(org).out('is github org for').has('hasValidfile', false).count()", 1),
+            ("g.V(org).out('is github org for').has('hasValidfile', true).count()", 1),
+            ("g.V(org).out('is github org for').not(has('hasValidfile')).count()", 1),
+            ("g.V(org).out('is github org for').has('isPrivate', false).count()", 2),
+            ("g.V(org).out('is in github org').has('isPrivate', true).count()", 0),
+        ]:
+            self.assertEqual(query(self.graph, gremlin_query, {"org": org_id}), [count], gremlin_query)
+
+        repos = query(self.graph, "g.V(org).out('is github org for')", {"org": org_id})
+        self.assertEqual(sorted(repo["properties"]["name"][0]["value"] for repo in repos), ["app", "docs", "lib"])
+        self.assertEqual({repo["properties"]["lastScanned"][0]["value"] for repo in repos}, {"2024-01-01"})
+
+        query(self.graph, "g.V(id).has('pk',pk).property('hash', 'reset')", {"id": repo_id, "pk": repo_pk})
+        self.assertEqual(get_vertex_properties(get_vertex(self.graph, repo_id, repo_pk))["hash"], ["reset"])
+
+    def test_scan_planner_query(self):
+        scan(self.graph, "2024-01-01", [], [], repo_properties={"hash": "a", "lastScanDuration": 2.5})
+
+        self.assertEqual(query(
+            self.graph,
+            "g.V(org).out('is github org for').project('id', 'properties').by(id)"
+            ".by(valueMap('hash', 'lastScanDuration'))",
+            {"org": org_id},
+        ), [{"id": repo_id, "properties": {"hash": ["a"], "lastScanDuration": [2.5]}}])
@@ -0,0 +1,63 @@
+import random
+import re
+import unittest
+
+from utils.matcher import FirstMatchClassifier, get_literal_prefix, is_combinable
+
+# patterns shaped like the PADU and technology tables, and the ones that cannot be spliced into an alternation
+patterns = [
+    r"^react$", r"^react-.*", r"^react-dom$", r"^@types/.*", r"^@angular/core$", r"^org\.springframework.*",
+    r"^org\.springframework\.boot:.*", r"^com\.google\.guava:guava$", r"^spring.*", r"^(spring|boot)-.*",
+    r"^a+b$", r"^ab?c", r"^a{2,3}$", r"^lodash(\.\w+)?$", r"^[a-c]x$", r"^\d+$", r"^x|^y", r"^(?:ab|cd)e",
+    r"(?i)^REACT$", r"^(a)\1$", r"^(?P<name>q)r$", r".q", r".(a)?(?(1)b|c)", r"^(x)?(?(1)y|z)w$", r"^$",
+    r"^py.*", r"^python:3\..*", r"^node:.*", r"^node:1[0-9]$",
+]
+
+alphabet = "abcdeqrxyzAB@/.:-0123456789"
+
+
+def loop_first_match(entries, name):
+    for regex, value in entries:
+        if regex.match(name):
+            return regex, value
+    return None
+
+
+def random_name(generator):
+    return "".join(generator.choice(alphabet) for _ in range(generator.randrange(0, 8)))
+
+
+class FirstMatchClassifierTest(unittest.TestCase):
+    def test_first_match_is_the_sequential_loop(self):
+        generator = random.Random(0)
+        names = [
+            "react", "react-dom", "react-router", "@types/node", "@angular/core", "org.springframework.boot:web",
+            "com.google.guava:guava", "spring-core", "boot-x", "aab", "ac", "abc", "aaa", "lodash.get", "bx", "123",
+            "y", "abe", "cde", "aa", "qr", "zab", "zac", "xyw", "zw", "", "python:3.9", "node:16", "node:12",
+        ] + [random_name(generator) for _ in range(2000)]
+
+        for seed in range(50):
+            order = list(patterns)
+            random.Random(seed).shuffle(order)
+            entries = [(re.compile(pattern), index) for index, pattern in enumerate(order)]
+            classifier = FirstMatchClassifier(entries)
+            for name in names:
+                self.assertEqual(classifier.first_match(name), loop_first_match(entries, name), (order, name))
+
+    def test_numbered_conditionals_are_matched_on_their_own(self):
+        entries = [(re.compile(r".q"), "Q"), (re.compile(r".(a)?(?(1)b|c)"), "X")]
+
+        self.assertFalse(is_combinable(entries[1][0]))
+        self.assertEqual(FirstMatchClassifier(entries).first_match("zab"), entries[1])
+
+    def test_all_matches_keeps_entry_order(self):
+        entries = [(re.compile(pattern), pattern) for pattern in [r"^react.*", r"^x", r"^react-dom$", r"^r"]]
+
+        self.assertEqual(FirstMatchClassifier(entries).all_matches("react-dom"), [entries[0], entries[2], entries[3]])
+
+    def test_literal_prefix(self):
+        self.assertEqual(get_literal_prefix(re.compile(r"^org\.springframework.*")), "org.springframework")
+        self.assertEqual(get_literal_prefix(re.compile(r"^ab?c")), "a")
+        self.assertEqual(get_literal_prefix(re.compile(r"^a+b$")), "a")
+        self.assertEqual(get_literal_prefix(re.compile(r"^x|^y")), "")
+        self.assertEqual(get_literal_prefix(re.compile(r"(?i)^REACT$")), "")
@@ -0,0 +1,115 @@
+import os
+import subprocess
+import tempfile
+import unittest
+
+from utils.provenance import FileProvenance
+
+tick = [0]
+
+
+def git(*args):
+    return subprocess.check_output(["git", *args], text=True)
+
+
+def commit(message, author):
+    tick[0] += 1
+    date = f"2020-01-01T00:{tick[0]:02d}:00+00:00"
+    environment = dict(
+        os.environ, GIT_AUTHOR_DATE=date, GIT_COMMITTER_DATE=date, GIT_AUTHOR_EMAIL=author,
+        GIT_COMMITTER_EMAIL=author,
+    )
+    subprocess.check_call(["git", "add", "-A"], env=environment)
+    subprocess.check_call(["git", "commit", "-q", "--allow-empty", "-m", message], env=environment)
+
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as file:
+        file.write(content)
+
+
+def follow(path):
+    # what each parser used to run
+    lines = git("--literal-pathspecs", "log", "--follow", "--format=%ae|%aI", "--", path).splitlines()
+    return tuple(lines[-1].split("|")) if lines else None
+
+
+def create_repository():
+    # in the current directory, returns the tracked files
+    tick[0] = 0
+    git("init", "-q", "-b", "main")
+    git("config", "user.name", "test")
+
+    body = "".join(f"line {n}\n" for n in range(40))
+    write("README.md", body)
+    write("a*.md", "star\n" + body)
+    write("a1.md", "one\n" + body)
+    write("a.md", "a\n" + body)
+    write("docs/vitals.yaml", "vitals\n" + body)
+    commit("initial", "first@example.com")
+
+    write("b.md", "b\n" + body)
+    # --follow takes this for a copy of a.md
+    write("d.md", "d\n" + body)
+    commit("add b", "second@example.com")
+
+    git("mv", "docs/vitals.yaml", "docs/vitals.yml")
+    commit("rename vitals", "third@example.com")
+
+    git("checkout", "-q", "-b", "side")
+    write("side.md", "side\n" + body)
+    # as a glob, this name matches a.md and b.md
+    write("[ab].md", "brackets\n")
+    write("a1.md", "one changed\n" + body)
+    commit("add side", "fourth@example.com")
+    git("mv", "b.md", "c.md")
+    commit("rename b", "fifth@example.com")
+
+    git("checkout", "-q", "main")
+    write("README.md", body + "more\n")
+    write("main.md", "main\n" + body)
+    commit("add main", "sixth@example.com")
+    os.makedirs("renamed")
+    git("mv", "main.md", "renamed/main.md")
+    commit("rename main", "seventh@example.com")
+
+    tick[0] += 1
+    date = f"2020-01-01T00:{tick[0]:02d}:00+00:00"
+    subprocess.check_call(
+        ["git", "merge", "-q", "--no-edit", "side"],
+        env=dict(os.environ, GIT_AUTHOR_DATE=date, GIT_COMMITTER_DATE=date, GIT_AUTHOR_EMAIL="merge@example.com",
+                 GIT_COMMITTER_EMAIL="merge@example.com"),
+    )
+
+    git("mv", "a*.md", "b*.md")
+    commit("rename star", "eighth@example.com")
+    write("[ab].md", "brackets changed\n")
+    commit("change brackets", "ninth@example.com")
+
+    return git("ls-files", "-z").split("\0")[:-1]
+
+
+class FileProvenanceTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(directory.name)
+        self.repository = create_repository()
+
+    def test_creations_match_git_log_follow(self):
+        self.assertLessEqual(
+            {"b*.md", "[ab].md", "c.md", "d.md", "side.md", "renamed/main.md", "docs/vitals.yml"}, set(self.repository)
+        )
+
+        provenance = FileProvenance(self.repository)
+        for path in self.repository:
+            self.assertEqual(provenance.get_creation(path), follow(path), path)
+
+    def test_each_file_on_its_own_matches_git_log_follow(self):
+        for path in self.repository:
+            self.assertEqual(FileProvenance().get_creation(f"./{path}"), follow(path), path)
+
+    def test_untracked_file_has_no_creation(self):
+        self.assertIsNone(FileProvenance(["missing.md"]).get_creation("missing.md"))
@@ -0,0 +1,80 @@
+import os
+import tempfile
+import unittest
+
+from utils.run_journal import STATUS_COMPLETED, STATUS_FAILED, STATUS_PENDING, RunJournal, pop_resume_argument
+
+
+class PopResumeArgumentTest(unittest.TestCase):
+    def test_without_resume(self):
+        argv = ["Dependency.py", "acme", "app"]
+
+        self.assertIsNone(pop_resume_argument(argv))
+        self.assertEqual(argv, ["Dependency.py", "acme", "app"])
+
+    def test_positional_arguments_keep_their_indices(self):
+        for argv in [
+            ["Dependency.py", "--resume", "run", "acme", "app"],
+            ["Dependency.py", "acme", "app", "--resume", "run"],
+        ]:
+            self.assertEqual(pop_resume_argument(argv), "run")
+            self.assertEqual(argv, ["Dependency.py", "acme", "app"])
+
+    def test_resume_needs_a_run_id(self):
+        with self.assertRaises(ValueError):
+            pop_resume_argument(["Dependency.py", "--resume"])
+
+
+class RunJournalTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "runs.sqlite")
+        self.journal = RunJournal(self.path)
+        self.addCleanup(self.journal.close)
+
+    def reopen(self):
+        journal = RunJournal(self.path)
+        self.addCleanup(journal.close)
+        return journal
+
+    def test_resume_hands_out_everything_not_completed(self):
+        run_id = self.journal.start_run("Dependency", "2024-01-01")
+        for repo_id in self.journal.iter_unfinished(["a", "b", "c", "d"], str):
+            if repo_id != "d":
+                self.journal.mark(repo_id, {"a": STATUS_COMPLETED, "b": STATUS_FAILED}.get(repo_id, STATUS_PENDING))
+
+        journal = self.reopen()
+        self.assertEqual(journal.resume_run(run_id, "Dependency"), "2024-01-01")
+        self.assertEqual(journal.count(STATUS_COMPLETED), 1)
+        self.assertEqual(journal.count(STATUS_FAILED), 1)
+        self.assertEqual(journal.count(STATUS_PENDING), 2)
+        self.assertEqual(list(journal.iter_unfinished(["a", "b", "c", "d", "e"], str)), ["b", "c", "d", "e"])
+        self.assertEqual(journal.count(STATUS_PENDING), 4)
+
+    def test_runs_are_kept_apart(self):
+        first_run_id = self.journal.start_run("Dependency", "2024-01-01")
+        self.journal.mark("a", STATUS_COMPLETED)
+        self.journal.start_run("Dependency", "2024-01-02")
+
+        self.assertEqual(self.journal.completed_repos(), set())
+        journal = self.reopen()
+        journal.resume_run(first_run_id, "Dependency")
+        self.assertEqual(journal.completed_repos(), {"a"})
+
+    def test_resume_checks_the_run(self):
+        run_id = self.journal.start_run("Dependency", "2024-01-01")
+
+        with self.assertRaises(ValueError):
+            self.reopen().resume_run("unknown", "Dependency")
+        with self.assertRaises(ValueError):
+            self.reopen().resume_run(run_id, "orthus")
+
+    def test_finished_run_can_be_resumed(self):
+        run_id = self.journal.start_run("Dependency", "2024-01-01")
+        self.journal.mark("a", STATUS_FAILED)
+        self.journal.finish_run()
+
+        journal = self.reopen()
+        self.assertEqual(journal.resume_run(run_id, "Dependency"), "2024-01-01")
+        self.assertEqual(list(journal.iter_unfinished(["a"], str)), ["a"])
@@ -0,0 +1,246 @@
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from concurrent.futures import Future
+from unittest import mock
+
+import requests
+
+# Dependency reads its configuration when it is imported
+workdir = tempfile.mkdtemp(prefix="dependency-test-")
+for key, value in {
+    "GITHUB_API_TOKEN": "unused",
+    "COSMOS_URI": "unused",
+    "COSMOS_PRIMARY_KEY": "unused",
+    "COSMOS_GRAPH_PRIMARY_KEY": "unused",
+    "CLASSIFICATION_CACHE_PATH": os.path.join(workdir, "classifications.sqlite"),
+    "PARSE_CACHE_PATH": os.path.join(workdir, "parse-results.sqlite"),
+    "RUN_JOURNAL_PATH": os.path.join(workdir, "runs.sqlite"),
+    "WORKSPACE_PATH": os.path.join(workdir, "workspaces"),
+    "METRICS_PATH": "",
+    # the worker initializer sets a global git option
+    "GIT_CONFIG_GLOBAL": os.path.join(workdir, "gitconfig"),
+}.items():
+    os.environ.setdefault(key, value)
+
+import Dependency  # noqa: E402
+from clients.gremlin import execute_gremlin_query, get_vertex, get_vertex_properties  # noqa: E402
+from clients.local_graph import LocalGraphClient  # noqa: E402
+from model.repository import RepositorySummary  # noqa: E402
+from utils.run_journal import STATUS_COMPLETED, STATUS_FAILED, RunJournal  # noqa: E402
+
+owner = "acme"
+repo_pk_prefix = "repository."
+
+
+def tearDownModule():
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+# the local graph, failing every batch that writes an edge with one of failing_labels
+class FailingGraphClient(LocalGraphClient):
+    def __init__(self, path: str) -> None:
+        super().__init__(path)
+        self.failing_labels = set()
+
+    def submitAsync(self, query, bindings=None):
+        labels = {value for value in (bindings or {}).values() if isinstance(value, str)}
+        if "addE(" in query and self.failing_labels & labels:
+            future = Future()
+            future.set_exception(Exception("edge batch failed"))
+            return future
+        return super().submitAsync(query, bindings)
+
+
+# answers the Sonar API with the given line coverage, in place of requests.get
+class FakeSonar:
+    def __init__(self, line_coverage: str) -> None:
+        self.line_coverage = line_coverage
+        self.components = []
+
+    def get(self, url, params=None, **kwargs):
+        if url.endswith("/measures/component"):
+            self.components.append(params["component"])
+            body = {"component": {"measures": [{"metric": "line_coverage", "value": self.line_coverage}]}}
+        else:
+            body = {"qualityGate": {"name": "GATE_00"}}
+        response = requests.models.Response()
+        response.status_code = 200
+        response.url = url
+        response._content = json.dumps(body).encode("utf-8")
+        return response
+
+
+def git(path, *args):
+    return subprocess.check_output(
+        ["git", "-C", path, "-c", "user.name=test", "-c", "user.email=test@example.com", *args], text=True
+    ).strip()
+
+
+def commit_files(path, files, message):
+    for name, content in files.items():
+        with open(os.path.join(path, name), "w") as file:
+            file.write(content)
+    git(path, "add", "-A")
+    git(path, "commit", "-q", "-m", message)
+    return git(path, "rev-parse", "HEAD")
+
+
+class ScanTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with mock.patch.object(Dependency, "gremlin", lambda: None):
+            Dependency.initialize_worker([], [], {}, "2024-01-01")
+        # the crawl logs every query at DEBUG
+        logging.getLogger().setLevel(logging.WARNING)
+
+    def setUp(self):
+        self.addCleanup(os.chdir, os.getcwd())
+        self.graph = FailingGraphClient(":memory:")
+        Dependency.gremlin_client = self.graph
+        Dependency.written_libraries = {}
+        Dependency.timestamp = "2024-01-01"
+
+        self.name = self.id().rsplit(".", 1)[-1]
+        self.remote = os.path.join(workdir, "remotes", owner, self.name)
+        os.makedirs(self.remote)
+        git(self.remote, "init", "-q")
+        patcher = mock.patch.object(Dependency, "get_clone_url", lambda repo: f"file://{self.remote}")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def commit(self, files, message="change"):
+        return commit_files(self.remote, files, message)
+
+    def get_repo(self, head_hash):
+        return RepositorySummary(
+            owner, self.name, f"https://github.com/{owner}/{self.name}", True, False, False, 0, head_hash
+        )
+
+    def get_repo_properties(self):
+        repo_id = f"{owner}.{self.name}"
+        return get_vertex_properties(get_vertex(self.graph, repo_id, f"{repo_pk_prefix}{repo_id}"))
+
+    def get_referenced_libraries(self):
+        repo_id = f"{owner}.{self.name}"
+        return sorted(execute_gremlin_query(
+            self.graph, "g.V(vertex_id).has('pk',vertex_pk).out(label).values('name')",
+            {"vertex_id": repo_id, "vertex_pk": f"{repo_pk_prefix}{repo_id}", "label": "references"},
+        ))
+
+    def package_json(self, dependencies):
+        return {"package.json": json.dumps({"name": "app", "dependencies": dependencies})}
+
+    def test_failed_edge_batch_is_written_by_the_next_run(self):
+        head_hash = self.commit(self.package_json({"left-pad": "1.0.0", "lodash": "4.0.0"}))
+
+        self.graph.failing_labels = {"references"}
+        _, status, _ = Dependency.worker(self.get_repo(head_hash))
+        self.assertEqual(status, STATUS_FAILED)
+        self.assertEqual(self.get_referenced_libraries(), [])
+        properties = self.get_repo_properties()
+        for key in ["hash", "manifestFingerprint", "resultDigest"]:
+            self.assertNotIn(key, properties)
+
+        # the same head: the next run must not take the repo for scanned
+        self.graph.failing_labels = set()
+        _, status, _ = Dependency.worker(self.get_repo(head_hash))
+        self.assertEqual(status, STATUS_COMPLETED)
+        self.assertEqual(self.get_referenced_libraries(), ["left-pad", "lodash"])
+        self.assertEqual(self.get_repo_properties()["hash"], [head_hash])
+
+        # a later commit that touches no manifest keeps the edges
+        head_hash = self.commit({"index.js": "console.log(1)\n"})
+        _, status, _ = Dependency.worker(self.get_repo(head_hash))
+        self.assertEqual(status, STATUS_COMPLETED)
+        self.assertEqual(self.get_referenced_libraries(), ["left-pad", "lodash"])
+        self.assertEqual(self.get_repo_properties()["hash"], [head_hash])
+
+    def test_failed_rescan_keeps_the_previous_hash(self):
+        first_hash = self.commit(self.package_json({"left-pad": "1.0.0"}))
+        Dependency.worker(self.get_repo(first_hash))
+
+        second_hash = self.commit(self.package_json({"left-pad": "1.0.0", "lodash": "4.0.0"}))
+        self.graph.failing_labels = {"references"}
+        _, status, _ = Dependency.worker(self.get_repo(second_hash))
+        self.assertEqual(status, STATUS_FAILED)
+        self.assertEqual(self.get_repo_properties()["hash"], [first_hash])
+
+        self.graph.failing_labels = set()
+        Dependency.worker(self.get_repo(second_hash))
+        self.assertEqual(self.get_referenced_libraries(), ["left-pad", "lodash"])
+        self.assertEqual(self.get_repo_properties()["hash"], [second_hash])
+
+    def test_resume_retries_a_failed_graph_write(self):
+        head_hash = self.commit(self.package_json({"left-pad": "1.0.0"}))
+        repo = self.get_repo(head_hash)
+        journal_path = os.path.join(workdir, f"{self.name}.sqlite")
+
+        # what main does with each repo the pool finishes
+        journal = RunJournal(journal_path)
+        run_id = journal.start_run("Dependency", Dependency.timestamp)
+        self.graph.failing_labels = {"references"}
+        for unfinished_repo in journal.iter_unfinished([repo], Dependency.get_repo_id):
+            repo_id, status, _ = Dependency.worker(unfinished_repo)
+            journal.mark(repo_id, status)
+        self.assertEqual(journal.count(STATUS_FAILED), 1)
+        journal.close()
+
+        journal = RunJournal(journal_path)
+        self.assertEqual(journal.resume_run(run_id, "Dependency"), Dependency.timestamp)
+        self.graph.failing_labels = set()
+        for unfinished_repo in journal.iter_unfinished([repo], Dependency.get_repo_id):
+            repo_id, status, _ = Dependency.worker(unfinished_repo)
+            journal.mark(repo_id, status)
+        self.assertEqual(journal.completed_repos(), {Dependency.get_repo_id(repo)})
+        self.assertEqual(self.get_referenced_libraries(), ["left-pad"])
+
+        # a second resume has nothing left to do
+        self.assertEqual(list(journal.iter_unfinished([repo], Dependency.get_repo_id)), [])
+        journal.close()
+
+    def test_manifests_unchanged_refreshes_sonar_measures(self):
+        sonar = FakeSonar("80.0")
+        patcher = mock.patch("handlers.sonar.requests.get", sonar.get)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        files = self.package_json({"left-pad": "1.0.0"})
+        files["vitals.yaml"] = "metadata:\n  projectKey: app-key\n"
+        Dependency.worker(self.get_repo(self.commit(files)))
+        properties = self.get_repo_properties()
+        self.assertEqual(properties["sonarLineCoverage"], ["80.0"])
+        self.assertEqual(sonar.components, ["app-key"])
+
+        # no manifest changed, only the coverage
+        sonar.line_coverage = "85.0"
+        head_hash = self.commit({"index.js": "console.log(1)\n"})
+        with mock.patch.object(Dependency.parser_index, "discover", side_effect=AssertionError("reparsed")):
+            _, status, _ = Dependency.worker(self.get_repo(head_hash))
+        self.assertEqual(status, STATUS_COMPLETED)
+        properties = self.get_repo_properties()
+        self.assertEqual(properties["sonarLineCoverage"], ["85.0"])
+        self.assertEqual(properties["hash"], [head_hash])
+        self.assertEqual(sonar.components, ["app-key", "app-key"])
+        self.assertEqual(self.get_referenced_libraries(), ["left-pad"])
+
+    def test_partial_clone_counts_the_blobs_fetched_during_the_scan(self):
+        git(self.remote, "config", "uploadpack.allowFilter", "true")
+        dependencies = {f"package-{n}": f"{n}.0.0" for n in range(300)}
+        head_hash = self.commit(self.package_json(dependencies))
+
+        clone_sizes = []
+        clone_repository = Dependency.clone_repository
+        with mock.patch.object(Dependency, "clone_mode", "partial"), mock.patch.object(
+            Dependency, "clone_repository", lambda *args: clone_sizes.append(clone_repository(*args)) or clone_sizes[-1]
+        ):
+            _, status, snapshot = Dependency.worker(self.get_repo(head_hash))
+        self.assertEqual(status, STATUS_COMPLETED)
+        self.assertEqual(len(self.get_referenced_libraries()), len(dependencies))
+
+        # the clone has no blobs, the manifest comes with the checkout
+        self.assertGreater(snapshot["counters"][("cloned_bytes_total", ())], clone_sizes[0])
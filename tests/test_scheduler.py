@@ -0,0 +1,119 @@
+import unittest
+
+from parameterized import parameterized
+
+from utils.scheduler import build_scan_plan, estimate_duration, round_robin, unchanged_repo_seconds
+
+
+def candidate(name, changed, duration, size=100):
+    return {"repo": None, "name": name, "size": size, "changed": changed, "duration": duration}
+
+
+def get_actions(plan):
+    return [(entry["name"], entry["action"], entry["force"]) for entry in plan["entries"]]
+
+
+class BuildScanPlanTest(unittest.TestCase):
+    def setUp(self):
+        self.candidates = [
+            candidate("small-change", True, 10.0),
+            candidate("unchanged-large", False, 50.0),
+            candidate("large-change", True, 40.0),
+            candidate("unchanged-small", False, 5.0),
+            candidate("unchanged-medium", False, 20.0),
+        ]
+
+    def test_changed_repos_go_first_largest_first(self):
+        plan = build_scan_plan(self.candidates, 2, 0, force=False)
+
+        self.assertEqual(get_actions(plan), [
+            ("large-change", "scan", False),
+            ("small-change", "scan", False),
+            ("unchanged-large", "check", False),
+            ("unchanged-medium", "check", False),
+            ("unchanged-small", "check", False),
+        ])
+        self.assertEqual(plan["changedRepos"], 2)
+        self.assertEqual(plan["forcedRescans"], 0)
+        self.assertEqual(plan["deferredRescans"], 0)
+        self.assertEqual(
+            [entry["estimated_seconds"] for entry in plan["entries"][2:]], [unchanged_repo_seconds] * 3
+        )
+
+    def test_forcing_without_a_budget_rescans_everything(self):
+        plan = build_scan_plan(self.candidates, 2, 0, force=True)
+
+        self.assertEqual(get_actions(plan), [
+            ("large-change", "scan", True),
+            ("small-change", "scan", True),
+            ("unchanged-large", "scan", True),
+            ("unchanged-medium", "scan", True),
+            ("unchanged-small", "scan", True),
+        ])
+        self.assertTrue(plan["fitsBudget"])
+
+    def test_forced_rescans_stop_at_the_budget(self):
+        # 2 workers for 40s: the changed repos and the three checks take 53s of the 80s, leaving room for the
+        # medium and small rescans (19s and 4s more) but not the large one (49s more)
+        plan = build_scan_plan(self.candidates, 2, 40, force=True)
+
+        self.assertEqual(get_actions(plan), [
+            ("large-change", "scan", True),
+            ("small-change", "scan", True),
+            ("unchanged-medium", "scan", True),
+            ("unchanged-small", "scan", True),
+            ("unchanged-large", "check", False),
+        ])
+        self.assertEqual(plan["forcedRescans"], 2)
+        self.assertEqual(plan["deferredRescans"], 1)
+        self.assertEqual(plan["estimatedDurationSeconds"], 40.0)
+        self.assertTrue(plan["fitsBudget"])
+
+    def test_changed_repos_are_scanned_over_the_budget(self):
+        plan = build_scan_plan(self.candidates, 1, 10, force=True)
+
+        self.assertEqual([name for name, action, _ in get_actions(plan) if action == "scan"],
+                         ["large-change", "small-change"])
+        self.assertEqual(plan["deferredRescans"], 3)
+        self.assertFalse(plan["fitsBudget"])
+
+    def test_repos_without_a_duration_are_estimated_from_their_size(self):
+        candidates = [
+            candidate("a", False, 11.0, size=1000),
+            candidate("b", False, 21.0, size=3000),
+            candidate("new", True, None, size=2000),
+        ]
+        plan = build_scan_plan(candidates, 1, 0, force=False)
+
+        self.assertAlmostEqual(plan["baseSeconds"], 6.0)
+        self.assertAlmostEqual(plan["secondsPerKb"], 0.005)
+        self.assertAlmostEqual(plan["entries"][0]["estimated_seconds"], 16.0)
+
+
+class EstimateDurationTest(unittest.TestCase):
+    @parameterized.expand([
+        ("no work", [], 2, 0.0),
+        ("one worker adds up", [3.0, 2.0, 1.0], 1, 6.0),
+        ("largest first", [4.0, 3.0, 2.0, 1.0], 2, 5.0),
+        ("next free worker", [1.0, 1.0, 4.0], 2, 5.0),
+        ("more workers than work", [2.0, 1.0], 4, 2.0),
+    ])
+    def test_estimate_duration(self, _, costs, processes, expected):
+        self.assertEqual(estimate_duration(costs, processes), expected)
+
+
+class RoundRobinTest(unittest.TestCase):
+    def test_takes_one_from_each_in_turn(self):
+        self.assertEqual(list(round_robin([[1, 2, 3], [], ["a"], "xy"])), [1, "a", "x", 2, "y", 3])
+
+    def test_advances_iterables_only_on_their_turn(self):
+        advanced = []
+
+        def pages():
+            for page in range(3):
+                advanced.append(page)
+                yield page
+
+        iterator = round_robin([pages(), ["a", "b"]])
+        self.assertEqual([next(iterator), next(iterator)], [0, "a"])
+        self.assertEqual(advanced, [0])
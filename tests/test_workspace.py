@@ -0,0 +1,108 @@
+import os
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+from utils.workspace import STATE_ADMITTED, STATE_DISCARDED, STATE_WAITING, WorkspaceManager
+
+
+def get_exited_pid():
+    process = subprocess.Popen(["true"])
+    process.wait()
+    return process.pid
+
+
+class WorkspaceManagerTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(os.chdir, os.getcwd())
+        self.manager = WorkspaceManager(directory.name, budget_bytes=100, poll_seconds=0.01)
+        self.addCleanup(self.manager.close)
+
+    def queue(self, name, size, pid=None, state=STATE_WAITING):
+        # what admit does before it starts polling, for another worker's clone
+        self.manager.index.execute(
+            "INSERT INTO reservations (name, size, pid, state) VALUES (?, ?, ?, ?)",
+            (name, size, pid or os.getpid(), state),
+        )
+
+    def get_states(self):
+        return dict(self.manager.index.execute("SELECT name, state FROM reservations"))
+
+    def test_workspace_is_an_empty_current_directory_until_discarded(self):
+        with self.manager.workspace(10) as path:
+            self.assertEqual(os.getcwd(), os.path.realpath(path))
+            self.assertEqual(os.listdir(path), [])
+            name = os.path.basename(path)
+            self.assertEqual(self.get_states(), {name: STATE_ADMITTED})
+
+        self.assertEqual(os.getcwd(), os.path.realpath(self.manager.path))
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(self.get_states(), {name: STATE_DISCARDED})
+
+    def test_head_ticket_that_does_not_fit_is_not_overtaken(self):
+        with self.manager.workspace(60):
+            self.queue("large", 60)
+            self.queue("small", 10)
+            self.assertFalse(self.manager.try_admit("small"))
+            self.assertFalse(self.manager.try_admit("large"))
+
+        # a discarded checkout counts until it is deleted
+        self.assertFalse(self.manager.try_admit("large"))
+        self.assertEqual(self.manager.reap(), 1)
+        self.assertTrue(self.manager.try_admit("large"))
+        self.assertTrue(self.manager.try_admit("small"))
+        self.assertEqual(self.get_states(), {"large": STATE_ADMITTED, "small": STATE_ADMITTED})
+
+    def test_oversized_checkout_is_admitted_alone(self):
+        with self.manager.workspace(10):
+            self.queue("huge", 500)
+            self.assertFalse(self.manager.try_admit("huge"))
+        self.manager.reap()
+
+        self.assertTrue(self.manager.try_admit("huge"))
+        self.queue("small", 1)
+        self.assertFalse(self.manager.try_admit("small"))
+
+    def test_reservations_of_an_exited_process_are_released(self):
+        pid = get_exited_pid()
+        self.queue("stuck", 10, pid=pid)
+        self.queue("crashed", 90, pid=pid, state=STATE_ADMITTED)
+        os.makedirs(os.path.join(self.manager.path, "crashed", "repo"))
+        self.queue("next", 50)
+
+        # the dead worker's ticket is dropped, its checkout is in the trash and counts until reaped
+        self.assertFalse(self.manager.try_admit("next"))
+        self.assertEqual(self.get_states(), {"crashed": STATE_DISCARDED, "next": STATE_WAITING})
+        self.assertFalse(os.path.exists(os.path.join(self.manager.path, "crashed")))
+
+        self.assertEqual(self.manager.reap(), 1)
+        self.assertTrue(self.manager.try_admit("next"))
+        self.assertEqual(self.get_states(), {"next": STATE_ADMITTED})
+
+    def test_reap_gives_bytes_back_to_the_budget(self):
+        for _ in range(3):
+            with self.manager.workspace(30) as path:
+                with open(os.path.join(path, "file"), "w") as file:
+                    file.write("content")
+
+        self.queue("next", 100)
+        self.assertFalse(self.manager.try_admit("next"))
+        self.assertEqual(self.manager.reap(), 3)
+        self.assertEqual(os.listdir(self.manager.trash_path), [])
+        self.assertEqual(self.manager.reap(), 0)
+        self.assertTrue(self.manager.try_admit("next"))
+
+    def test_admit_waits_for_the_budget(self):
+        self.queue("other", 80, state=STATE_ADMITTED)
+        os.makedirs(os.path.join(self.manager.path, "other"))
+
+        with mock.patch("utils.workspace.sleep") as sleep:
+            # the other worker's checkout is discarded and deleted while this one waits
+            sleep.side_effect = lambda seconds: (self.manager.discard("other"), self.manager.reap())
+            self.manager.admit("mine", 50)
+
+        sleep.assert_called_once_with(0.01)
+        self.assertEqual(self.get_states(), {"mine": STATE_ADMITTED})
@@ -0,0 +1,64 @@
+import hashlib
+import json
+import logging
+import sqlite3
+from typing import Dict, List, Optional
+
+
+def get_table_version(padu: List[dict], technologies: List[dict]) -> str:
+    # any change to a PADU entry or technology (including regex order, which decides the first match) changes this
+    tables = {
+        "padu": [[tech["name"], tech["ranking"], [regex.pattern for regex in tech["regexes"]]] for tech in padu],
+        "technologies": [
+            [technology["id"], technology["pk"], [regex.pattern for regex in technology["regexes"]]]
+            for technology in technologies
+        ],
+    }
+    return hashlib.sha256(json.dumps(tables, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class ClassificationCache:
+    def __init__(self, path: str, version: str) -> None:
+        self.path = path
+        self.version = version
+        # every pool worker opens its own connection; WAL lets them read while another one writes
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS classifications ("
+            "library TEXT PRIMARY KEY, version TEXT NOT NULL, padu_ranking TEXT NOT NULL, technology TEXT)"
+        )
+
+    def evict_stale(self):
+        cursor = self.connection.execute("DELETE FROM classifications WHERE version != ?", (self.version,))
+        logging.info(f"Evicted {cursor.rowcount} stale classifications from {self.path}")
+
+    def get(self, library: str) -> Optional[Dict]:
+        row = self.connection.execute(
+            "SELECT padu_ranking, technology FROM classifications WHERE library = ? AND version = ?",
+            (library, self.version),
+        ).fetchone()
+        if row is None:
+            return None
+
+        return {"padu_ranking": json.loads(row[0]), "technology": json.loads(row[1]) if row[1] else None}
+
+    def put_many(self, classifications: Dict[str, Dict]):
+        if not classifications:
+            return
+
+        rows = [
+            (
+                library,
+                self.version,
+                json.dumps(classification["padu_ranking"]),
+                json.dumps(classification["technology"]) if classification["technology"] else None,
+            )
+            for library, classification in classifications.items()
+        ]
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            self.connection.executemany("INSERT OR REPLACE INTO classifications VALUES (?, ?, ?, ?)", rows)
+
+    def close(self):
+        self.connection.close()
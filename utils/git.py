@@ -0,0 +1,206 @@
+import base64
+import logging
+import os
+import posixpath
+import re
+import subprocess
+from collections import Counter
+from time import time
+from typing import Callable, Dict, List
+
+CLONE_MODE_FULL = "full"
+CLONE_MODE_PARTIAL = "partial"
+
+sparse_special_characters = re.compile(r"([\\*?\[ ])")
+
+# the tree entry mode of a symbolic link, whose blob is the link's target path
+SYMLINK_MODE = "120000"
+# as far as links to links are followed, like the kernel's limit on nested symlinks
+max_symlink_depth = 40
+
+
+def configure_authentication(token: str, url_prefix: str = "https://github.com/"):
+    # authenticates every git command this process and its children run against url_prefix through
+    # GIT_CONFIG_* variables, appended to any already set, so token-free urls can be cloned and the token
+    # never ends up in a repository's config
+    credentials = base64.b64encode(f"{token}:x-oauth-basic".encode("utf-8")).decode("ascii")
+    index = int(os.environ.get("GIT_CONFIG_COUNT", "0"))
+    os.environ[f"GIT_CONFIG_KEY_{index}"] = f"http.{url_prefix}.extraHeader"
+    os.environ[f"GIT_CONFIG_VALUE_{index}"] = f"Authorization: Basic {credentials}"
+    os.environ["GIT_CONFIG_COUNT"] = str(index + 1)
+
+
+def clone_repository(clone_url: str, mode: str) -> int:
+    # fetches without checking anything out, so the tree can be listed before deciding to check it out at all,
+    # see checkout_repository
+    start_time = time()
+    if mode == CLONE_MODE_PARTIAL:
+        # blobless rather than treeless: `git log -- <path>` needs every commit's trees, which a treeless
+        # clone would have to fetch back one round trip at a time
+        command = ["git", "clone", "--filter=blob:none", "--no-checkout", clone_url, "."]
+    else:
+        command = ["git", "clone", "--no-checkout", clone_url, "."]
+    subprocess.check_output(command, stderr=subprocess.STDOUT, text=True)
+    elapsed_time = time() - start_time
+
+    fetched_bytes = get_object_store_size()
+    logging.info(f"Cloned in {mode} mode in {elapsed_time} seconds, fetched {fetched_bytes} bytes")
+    return fetched_bytes
+
+
+def checkout_repository(mode: str, will_parse: Callable[[str], bool]):
+    # checks HEAD out into a clone or worktree made without one
+    if mode == CLONE_MODE_PARTIAL:
+        checkout_manifests_only(will_parse)
+    else:
+        subprocess.check_output(["git", "checkout"], stderr=subprocess.STDOUT, text=True)
+
+
+def checkout_manifests_only(will_parse: Callable[[str], bool]):
+    # paths are handed to the parsers relative to the checkout, the same way os.walk(".") reports them
+    manifest_paths = [path for path in list_tracked_files() if will_parse(f"./{path}")]
+    logging.info(f"Materializing {len(manifest_paths)} manifest files")
+
+    sparse_patterns = "".join(f"/{escape_sparse_path(path)}\n" for path in manifest_paths)
+    subprocess.check_output(
+        ["git", "sparse-checkout", "set", "--no-cone", "--stdin"],
+        input=sparse_patterns, stderr=subprocess.STDOUT, text=True
+    )
+    if manifest_paths:
+        subprocess.check_output(["git", "checkout"], stderr=subprocess.STDOUT, text=True)
+
+
+def escape_sparse_path(path: str) -> str:
+    # sparse-checkout patterns use gitignore syntax, so glob characters in real file names must be escaped
+    return sparse_special_characters.sub(r"\\\1", path)
+
+
+def list_tracked_files(revision: str = "HEAD") -> List[str]:
+    try:
+        output = subprocess.check_output(
+            ["git", "ls-tree", "-r", "-z", "--name-only", revision], stderr=subprocess.DEVNULL, text=True
+        )
+    except subprocess.CalledProcessError:
+        # empty repositories have no HEAD to list
+        return []
+
+    return [path for path in output.split("\0") if path]
+
+
+def list_tracked_blobs(revision: str = "HEAD") -> Dict[str, str]:
+    # path -> blob id of every file in the revision; submodules are commits, not blobs, and are left out. A symlink
+    # maps to the blob of the file it points to, which is what reading it returns; one pointing outside the
+    # revision's files is left out
+    try:
+        output = subprocess.check_output(
+            ["git", "ls-tree", "-r", "-z", "--full-tree", revision], stderr=subprocess.DEVNULL, text=True
+        )
+    except subprocess.CalledProcessError:
+        return {}
+
+    blobs = {}
+    symlinks = {}
+    for entry in output.split("\0"):
+        if not entry:
+            continue
+        info, path = entry.split("\t", 1)
+        mode, object_type, object_id = info.split(" ")
+        if mode == SYMLINK_MODE:
+            symlinks[path] = object_id
+        elif object_type == "blob":
+            blobs[path] = object_id
+
+    if symlinks:
+        blobs.update(resolve_symlinks(blobs, symlinks))
+    return blobs
+
+
+def resolve_symlinks(blobs: Dict[str, str], symlinks: Dict[str, str]) -> Dict[str, str]:
+    # symlink path -> blob id of its target, following links to links
+    link_targets = {
+        object_id: target.decode("utf-8", "surrogateescape")
+        for object_id, target in read_blobs(set(symlinks.values())).items()
+    }
+
+    resolved = {}
+    for path in symlinks:
+        target = path
+        for _ in range(max_symlink_depth):
+            link_target = link_targets.get(symlinks[target])
+            if link_target is None:
+                break
+            target = posixpath.normpath(posixpath.join(posixpath.dirname(target), link_target))
+            if target not in symlinks:
+                break
+        if target in blobs:
+            resolved[path] = blobs[target]
+
+    return resolved
+
+
+def read_blobs(object_ids) -> Dict[str, bytes]:
+    # the contents of the given blobs, in one `git cat-file --batch`
+    batch = "".join(f"{object_id}\n" for object_id in object_ids).encode("ascii")
+    output = subprocess.check_output(["git", "cat-file", "--batch"], input=batch, stderr=subprocess.DEVNULL)
+
+    contents = {}
+    position = 0
+    while position < len(output):
+        header_end = output.index(b"\n", position)
+        header = output[position:header_end].decode("ascii").split(" ")
+        if len(header) != 3:
+            # "<object id> missing"
+            position = header_end + 1
+            continue
+        object_id, _, size = header
+        contents[object_id] = output[header_end + 1:header_end + 1 + int(size)]
+        # every object is followed by a newline
+        position = header_end + 1 + int(size) + 1
+
+    return contents
+
+
+def get_object_store_size(cwd: str = None) -> int:
+    output = subprocess.check_output(["git", "count-objects", "-v"], cwd=cwd, text=True)
+    stats = dict(line.split(": ", 1) for line in output.splitlines())
+
+    # count-objects reports sizes in KiB
+    return (int(stats["size"]) + int(stats["size-pack"])) * 1024
+
+
+def collect_commit_statistics() -> dict:
+    # one streamed pass over the history instead of `git log | sort | uniq -c | sort | head` and two more git logs
+    committers = Counter()
+    last_commit_date = ""
+    last_committer = ""
+
+    process = subprocess.Popen(
+        ["git", "--no-pager", "log", "--format=%ae%x00%cd"],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, errors="replace"
+    )
+    with process:
+        for line in process.stdout:
+            email, _, commit_date = line.rstrip("\n").partition("\0")
+            if not committers:
+                last_committer = email
+                last_commit_date = commit_date
+            committers[email] += 1
+
+    most_frequent_committer = ""
+    if committers:
+        # `sort -n -r | head -n 1` broke ties in favour of the greatest email
+        most_frequent_committer = max(committers.items(), key=lambda item: (item[1], item[0]))[0]
+
+    return {
+        "lastCommitDate": last_commit_date,
+        "lastCommitter": last_committer,
+        "mostFrequentCommitter": most_frequent_committer,
+    }
+
+
+def count_remote_branches() -> int:
+    # the clone already has every remote branch; origin/HEAD is a symbolic ref and not a branch of its own
+    output = subprocess.check_output(
+        ["git", "for-each-ref", "--format=%(symref)", "refs/remotes"], stderr=subprocess.DEVNULL, text=True
+    )
+    return sum(1 for symref in output.splitlines() if not symref)
@@ -0,0 +1,158 @@
+import re
+from typing import Any, List, Optional, Pattern, Tuple
+
+# compiling an empty pattern gives the flags every pattern gets by default (re.UNICODE for str patterns)
+default_flags = re.compile("").flags
+
+literal_characters = re.compile(r"[A-Za-z0-9_\-/:@#%&='<>,;~`\"! ]")
+quantifier_characters = "*?{"
+
+
+def get_literal_prefix(regex: Pattern) -> str:
+    # the text every match of the pattern must start with; "" whenever that cannot be proven
+    pattern = regex.pattern
+    if regex.flags != default_flags or has_top_level_alternation(pattern):
+        return ""
+
+    index = 1 if pattern.startswith("^") else 0
+    prefix = ""
+    while index < len(pattern):
+        character = pattern[index]
+        if character == "\\" and index + 1 < len(pattern) and not pattern[index + 1].isalnum():
+            literal, length = pattern[index + 1], 2
+        elif literal_characters.fullmatch(character):
+            literal, length = character, 1
+        else:
+            break
+
+        index += length
+        if index < len(pattern) and pattern[index] in quantifier_characters:
+            # the last literal is optional (or repeated a variable number of times)
+            break
+        prefix += literal
+        if index < len(pattern) and pattern[index] == "+":
+            break
+
+    return prefix
+
+
+def has_top_level_alternation(pattern: str) -> bool:
+    depth = 0
+    in_class = False
+    index = 0
+    while index < len(pattern):
+        character = pattern[index]
+        if character == "\\":
+            index += 2
+            continue
+        if in_class:
+            if character == "]":
+                in_class = False
+        elif character == "[":
+            in_class = True
+            # a "]" straight after the opening bracket (or after "^") is a literal
+            if pattern[index + 1:index + 2] == "^":
+                index += 1
+            if pattern[index + 1:index + 2] == "]":
+                index += 1
+        elif character == "(":
+            depth += 1
+        elif character == ")":
+            depth -= 1
+        elif character == "|" and depth == 0:
+            return True
+        index += 1
+
+    return False
+
+
+def is_combinable(regex: Pattern) -> bool:
+    # global inline flags, backreferences, conditionals and named groups all change meaning (or fail to compile)
+    # once the pattern is spliced into a larger alternation, where its groups are numbered after every group of
+    # the patterns before it, so those patterns are matched on their own
+    pattern = regex.pattern
+    if regex.flags != default_flags:
+        return False
+    if "(?P" in pattern or "(?(" in pattern or re.search(r"\\[0-9]", pattern):
+        return False
+    try:
+        re.compile(f"(?:{pattern})")
+    except re.error:
+        return False
+    return True
+
+
+# Finds the first (regex, value) entry whose regex matches, exactly like looping over the entries in order.
+# A trie of the literal prefix each regex requires narrows the entries down to candidates, which are then
+# tried as one alternation of named groups instead of one regex at a time.
+class FirstMatchClassifier:
+    def __init__(self, entries: List[Tuple[Pattern, Any]]) -> None:
+        self.entries = entries
+        self.combinable = [is_combinable(regex) for regex, _ in entries]
+        self.prefix_trie = {}
+        self.segment_cache = {}
+
+        for index, (regex, _) in enumerate(entries):
+            node = self.prefix_trie
+            for character in get_literal_prefix(regex):
+                node = node.setdefault(character, {})
+            node.setdefault("", []).append(index)
+
+    def candidates(self, name: str) -> Tuple[int, ...]:
+        node = self.prefix_trie
+        indices = list(node.get("", []))
+        for character in name:
+            node = node.get(character)
+            if node is None:
+                break
+            indices += node.get("", [])
+
+        return tuple(sorted(indices))
+
+    def get_segments(self, candidates: Tuple[int, ...]):
+        segments = self.segment_cache.get(candidates)
+        if segments is not None:
+            return segments
+
+        # consecutive combinable entries share one compiled alternation; the rest stay on their own
+        segments = []
+        group = []
+        for index in candidates:
+            if self.combinable[index]:
+                group.append(index)
+                continue
+            if group:
+                segments.append(self.combine(group))
+                group = []
+            segments.append((self.entries[index][0], index))
+        if group:
+            segments.append(self.combine(group))
+
+        self.segment_cache[candidates] = segments
+        return segments
+
+    def combine(self, indices: List[int]):
+        if len(indices) == 1:
+            return self.entries[indices[0]][0], indices[0]
+
+        pattern = "|".join(f"(?P<m{index}>{self.entries[index][0].pattern})" for index in indices)
+        return re.compile(pattern), None
+
+    def first_match(self, name: str) -> Optional[Tuple[Pattern, Any]]:
+        candidates = self.candidates(name)
+        if not candidates:
+            return None
+
+        for regex, index in self.get_segments(candidates):
+            match = regex.match(name)
+            if match is None:
+                continue
+            if index is None:
+                # the wrapping named group is the outermost one, so it is always the last group to close
+                index = int(match.lastgroup[1:])
+            return self.entries[index]
+
+        return None
+
+    def all_matches(self, name: str) -> List[Tuple[Pattern, Any]]:
+        return [self.entries[index] for index in self.candidates(name) if self.entries[index][0].match(name)]
@@ -0,0 +1,151 @@
+import json
+import os
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from time import time
+from typing import Dict, Tuple
+
+# upper bounds in seconds, from a cached parse to a clone of a very large repo
+duration_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+metric_prefix = "crawler_"
+
+
+def get_key(name: str, labels: Dict[str, str]) -> Tuple:
+    return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+
+def format_labels(labels: Tuple, extra: str = "") -> str:
+    parts = [f'{label}="{value}"' for label, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+# Counters and duration histograms of one process. Pool workers hand theirs to the main process with every
+# finished repo (see drain), and the main process merges them into the run totals it exports. In the main process
+# the pool's result thread merges while the main thread keeps counting, hence the lock.
+class Metrics:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.counters = {}
+        # key -> [bucket counts..., +Inf count, sum]
+        self.histograms = {}
+
+    def increment(self, name: str, value: float = 1, **labels):
+        key = get_key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = get_key(name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * (len(duration_buckets) + 2)
+            histogram[bisect_left(duration_buckets, seconds)] += 1
+            histogram[-1] += seconds
+
+    @contextmanager
+    def time(self, name: str, **labels):
+        start_time = time()
+        try:
+            yield
+        finally:
+            self.observe(name, time() - start_time, **labels)
+
+    def count_series(self, name: str) -> int:
+        # the number of distinct label sets a counter was incremented with
+        with self.lock:
+            return sum(1 for key_name, _ in self.counters if key_name == name)
+
+    def drain(self) -> dict:
+        with self.lock:
+            snapshot = {"counters": self.counters, "histograms": self.histograms}
+            self.counters = {}
+            self.histograms = {}
+        return snapshot
+
+    def merge(self, snapshot: dict):
+        with self.lock:
+            for key, value in snapshot["counters"].items():
+                self.counters[key] = self.counters.get(key, 0) + value
+            for key, counts in snapshot["histograms"].items():
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    self.histograms[key] = list(counts)
+                else:
+                    for index, count in enumerate(counts):
+                        histogram[index] += count
+
+    def copy(self) -> "Metrics":
+        copy = Metrics()
+        with self.lock:
+            copy.counters = dict(self.counters)
+            copy.histograms = {key: list(histogram) for key, histogram in self.histograms.items()}
+        return copy
+
+    def after_fork(self):
+        # a pool worker forked while another thread held the lock would otherwise never get it
+        self.lock = threading.Lock()
+
+    def to_prometheus(self) -> str:
+        lines = []
+        for name in sorted({name for name, _ in self.counters}):
+            lines.append(f"# TYPE {metric_prefix}{name} counter")
+            for (key_name, labels), value in sorted(self.counters.items()):
+                if key_name == name:
+                    lines.append(f"{metric_prefix}{name}{format_labels(labels)} {value}")
+
+        for name in sorted({name for name, _ in self.histograms}):
+            lines.append(f"# TYPE {metric_prefix}{name} histogram")
+            for (key_name, labels), histogram in sorted(self.histograms.items()):
+                if key_name != name:
+                    continue
+                # prometheus buckets are cumulative
+                cumulative = 0
+                for bound, count in zip(duration_buckets + ("+Inf",), histogram[:-1]):
+                    cumulative += count
+                    bucket_labels = format_labels(labels, f'le="{bound}"')
+                    lines.append(f"{metric_prefix}{name}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{metric_prefix}{name}_sum{format_labels(labels)} {histogram[-1]}")
+                lines.append(f"{metric_prefix}{name}_count{format_labels(labels)} {cumulative}")
+
+        return "\n".join(lines) + "\n"
+
+    def to_json(self) -> dict:
+        return {
+            "counters": [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self.counters.items())
+            ],
+            "histograms": [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "buckets": dict(zip([str(bound) for bound in duration_buckets] + ["+Inf"], histogram[:-1])),
+                    "count": sum(histogram[:-1]),
+                    "sum": histogram[-1],
+                }
+                for (name, labels), histogram in sorted(self.histograms.items())
+            ],
+        }
+
+    def export(self, path: str):
+        # a Prometheus textfile for *.prom, JSON otherwise; replaced atomically so a scraper never reads half a file
+        snapshot = self.copy()
+        if path.endswith(".prom"):
+            content = snapshot.to_prometheus()
+        else:
+            content = json.dumps(snapshot.to_json(), indent=2)
+
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w") as file:
+            file.write(content)
+        os.replace(temporary_path, path)
+
+
+# this process's metrics
+metrics = Metrics()
+os.register_at_fork(after_in_child=metrics.after_fork)
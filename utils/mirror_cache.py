@@ -0,0 +1,112 @@
+import fcntl
+import logging
+import os
+import shutil
+import sqlite3
+import subprocess
+from contextlib import contextmanager
+from time import time
+from utils.git import CLONE_MODE_PARTIAL, get_object_store_size
+
+# the default branch head is fetched into its own ref namespace so refs/remotes only holds real branches
+head_ref = "refs/crawler/HEAD"
+
+
+def run_git(args, cwd=None):
+    return subprocess.check_output(["git", *args], cwd=cwd, stderr=subprocess.STDOUT, text=True)
+
+
+# Bare repositories kept between runs, one per repo, updated with an incremental fetch and checked out through
+# worktrees. Every pool worker opens its own MirrorCache on the same directory: a repo's mirror is guarded by an
+# flock on its lock file for as long as a worktree of it is in use, and sizes and last use times live in a
+# shared SQLite index so any worker can evict least recently used mirrors once the total goes over budget.
+class MirrorCache:
+    def __init__(self, path: str, budget_bytes: int) -> None:
+        self.path = path
+        self.budget_bytes = budget_bytes
+        os.makedirs(path, exist_ok=True)
+
+        self.index = sqlite3.connect(os.path.join(path, "index.sqlite"), timeout=60, isolation_level=None)
+        self.index.execute("PRAGMA journal_mode=WAL")
+        self.index.execute(
+            "CREATE TABLE IF NOT EXISTS mirrors (repo_id TEXT PRIMARY KEY, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+
+    def mirror_path(self, repo_id: str) -> str:
+        return os.path.join(self.path, f"{repo_id}.git")
+
+    def lock_path(self, repo_id: str) -> str:
+        # lock files are never deleted, so every process always locks the same inode
+        return os.path.join(self.path, f"{repo_id}.lock")
+
+    @contextmanager
+    def checkout(self, repo_id: str, clone_url: str, mode: str):
+        # adds a worktree of the default branch head in the current directory, without checking it out (see
+        # utils.git.checkout_repository), and yields the number of bytes fetched
+        with open(self.lock_path(repo_id), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            mirror_path = self.mirror_path(repo_id)
+            worktree_path = os.getcwd()
+
+            start_time = time()
+            fetched_bytes = self.fetch(mirror_path, clone_url, mode)
+            logging.info(
+                f"Fetched {repo_id} mirror in {mode} mode in {time() - start_time} seconds, {fetched_bytes} new bytes"
+            )
+
+            # the worktree directory belongs to the caller and is deleted by it; the mirror forgets about it
+            # with `git worktree prune` on its next fetch
+            run_git(["worktree", "add", "--no-checkout", "--detach", worktree_path, head_ref], cwd=mirror_path)
+
+            self.index.execute(
+                "INSERT OR REPLACE INTO mirrors VALUES (?, ?, ?)", (repo_id, get_object_store_size(mirror_path), time())
+            )
+            self.evict(keep=repo_id)
+
+            yield fetched_bytes
+
+    def fetch(self, mirror_path: str, clone_url: str, mode: str) -> int:
+        if not os.path.isdir(mirror_path):
+            run_git(["init", "--bare", "--quiet", mirror_path])
+            run_git(["remote", "add", "origin", clone_url], cwd=mirror_path)
+            if mode == CLONE_MODE_PARTIAL:
+                # makes origin a promisor remote, so missing blobs are fetched on demand like in a blobless clone
+                run_git(["config", "remote.origin.promisor", "true"], cwd=mirror_path)
+                run_git(["config", "remote.origin.partialclonefilter", "blob:none"], cwd=mirror_path)
+        else:
+            # mirrors created before the token moved out of clone urls still have it in their config
+            run_git(["remote", "set-url", "origin", clone_url], cwd=mirror_path)
+            # forget worktrees whose directories were deleted without `git worktree remove`
+            run_git(["worktree", "prune"], cwd=mirror_path)
+
+        size_before = get_object_store_size(mirror_path)
+        run_git(
+            ["fetch", "--quiet", "--prune", "origin", "+refs/heads/*:refs/remotes/origin/*", f"+HEAD:{head_ref}"],
+            cwd=mirror_path,
+        )
+        return get_object_store_size(mirror_path) - size_before
+
+    def evict(self, keep: str):
+        rows = self.index.execute("SELECT repo_id, size FROM mirrors ORDER BY last_used").fetchall()
+        total_size = sum(size for _, size in rows)
+
+        for repo_id, size in rows:
+            if total_size <= self.budget_bytes:
+                return
+            if repo_id == keep:
+                continue
+
+            with open(self.lock_path(repo_id), "a") as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    # another worker has it checked out
+                    continue
+
+                logging.info(f"Evicting {repo_id} mirror ({size} bytes) from the mirror cache")
+                shutil.rmtree(self.mirror_path(repo_id), ignore_errors=True)
+                self.index.execute("DELETE FROM mirrors WHERE repo_id = ?", (repo_id,))
+                total_size -= size
+
+    def close(self):
+        self.index.close()
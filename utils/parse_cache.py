@@ -0,0 +1,82 @@
+import json
+import logging
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+from handlers.FileParserInterface import FileParserInterface, ParserResult
+from model.issue import Issue
+
+
+def get_parser_key(parser: FileParserInterface) -> Tuple[str, int]:
+    return type(parser).__name__, parser.version
+
+
+def serialize_result(result: ParserResult) -> str:
+    return json.dumps({
+        "framework": result.framework,
+        "dependencies": result.dependencies,
+        "metadata": result.metadata,
+        "issues": [vars(issue) for issue in result.issues],
+    })
+
+
+def deserialize_result(data: str) -> ParserResult:
+    result = json.loads(data)
+    return ParserResult(
+        result["framework"],
+        result["dependencies"],
+        result["metadata"],
+        [Issue(**issue) for issue in result["issues"]],
+    )
+
+
+# Parse results keyed by what they were computed from: the parser, its version and the git blob id of the file.
+# Identical manifests in different repos (or unchanged ones between runs) are parsed once.
+class ParseCache:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        # every pool worker opens its own connection; WAL lets them read while another one writes
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS parse_results ("
+            "parser TEXT NOT NULL, version INTEGER NOT NULL, blob TEXT NOT NULL, result TEXT NOT NULL, "
+            "PRIMARY KEY (parser, version, blob))"
+        )
+
+    def evict_stale(self, parsers: List[FileParserInterface]):
+        evicted = 0
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            for parser in parsers:
+                name, version = get_parser_key(parser)
+                cursor = self.connection.execute(
+                    "DELETE FROM parse_results WHERE parser = ? AND version != ?", (name, version)
+                )
+                evicted += cursor.rowcount
+        logging.info(f"Evicted {evicted} stale parse results from {self.path}")
+
+    def get(self, parser: FileParserInterface, blob: str) -> Optional[ParserResult]:
+        row = self.connection.execute(
+            "SELECT result FROM parse_results WHERE parser = ? AND version = ? AND blob = ?",
+            (*get_parser_key(parser), blob),
+        ).fetchone()
+        if row is None:
+            return None
+
+        return deserialize_result(row[0])
+
+    def put_many(self, results: Dict[Tuple[FileParserInterface, str], ParserResult]):
+        if not results:
+            return
+
+        rows = [
+            (*get_parser_key(parser), blob, serialize_result(result))
+            for (parser, blob), result in results.items()
+        ]
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            self.connection.executemany("INSERT OR REPLACE INTO parse_results VALUES (?, ?, ?, ?)", rows)
+
+    def close(self):
+        self.connection.close()
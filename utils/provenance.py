@@ -0,0 +1,159 @@
+import logging
+import subprocess
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+commit_marker = "\x01"
+
+
+def strip_current_directory(file_path: str) -> str:
+    # parsers see paths the way os.walk(".") reports them, git wants them relative to the repo root
+    return file_path[2:] if file_path.startswith("./") else file_path
+
+
+def iter_commits_touching(paths: Iterable[str], revision: str):
+    # yields (commit, author email, author date, [(status, path)]) newest first, like `git log -- <paths>`
+    output = subprocess.check_output(
+        [
+            "git", "--no-pager", "--literal-pathspecs", "log", "--format=%x01%H%x00%ae%x00%aI", "--name-status",
+            "--no-renames", "-z", revision, "--", *paths,
+        ],
+        stderr=subprocess.DEVNULL, text=True, errors="replace"
+    )
+
+    for record in output.split(commit_marker)[1:]:
+        commit, author, date, changes = record.split("\0", 3)
+        fields = changes.lstrip("\n").split("\0")
+        yield commit, author, date, [(fields[i], fields[i + 1]) for i in range(0, len(fields) - 1, 2)]
+
+
+def find_merged_paths(paths: Iterable[str], revision: str) -> Set[str]:
+    # those of paths that differ between a merge commit and any of its parents. History simplification picks the
+    # parent to follow at such a merge for the whole pathspec, so one file's history can come out differently than
+    # it does on its own
+    output = subprocess.check_output(
+        [
+            "git", "--no-pager", "--literal-pathspecs", "log", "--merges", "--full-history", "-m", "--format=",
+            "--name-only", "--no-renames", "-z", revision, "--", *paths,
+        ],
+        stderr=subprocess.DEVNULL, text=True, errors="replace"
+    )
+
+    return {path.strip("\n") for path in output.split("\0")} - {""}
+
+
+def find_creation_following(path: str, revision: str) -> Optional[Tuple[str, str, str]]:
+    # (author, date, commit) from the last line of `git log --follow -- <path>`
+    output = subprocess.check_output(
+        [
+            "git", "--no-pager", "--literal-pathspecs", "log", "--follow", "--format=%ae%x00%aI%x00%H", revision,
+            "--", path,
+        ],
+        stderr=subprocess.DEVNULL, text=True, errors="replace"
+    )
+
+    lines = output.splitlines()
+    if not lines:
+        return None
+    author, date, commit = lines[-1].split("\0")
+    return author, date, commit
+
+
+def find_rename_source(commit: str, path: str) -> Optional[str]:
+    # `git log --follow` looks for the file among renames and copies of any file in the parent, as below
+    output = subprocess.check_output(
+        ["git", "diff-tree", "-r", "-C", "--find-copies-harder", "--name-status", "-z", "--no-commit-id", commit],
+        stderr=subprocess.DEVNULL, text=True, errors="replace"
+    )
+
+    fields = output.split("\0")
+    index = 0
+    while index < len(fields) - 1:
+        status = fields[index]
+        if status.startswith("R") or status.startswith("C"):
+            source, destination = fields[index + 1], fields[index + 2]
+            if destination == path:
+                return source
+            index += 3
+        else:
+            index += 2
+
+    return None
+
+
+# Who created each of a set of tracked files and when, the way the last line of `git log --follow -- <file>` says,
+# but for all of them in one history traversal. A file is only looked at again with its previous name when its
+# history runs into the commit that renamed it. Files that a merge changed relative to one of its parents get a
+# `git log --follow` of their own, where history simplification is done for them alone.
+class FileProvenance:
+    def __init__(self, file_paths: Iterable[str] = (), revision: str = "HEAD") -> None:
+        self.revision = revision
+        self.pending = {strip_current_directory(file_path) for file_path in file_paths}
+        self.creations = {}
+
+    def get_creation(self, file_path: str) -> Optional[Tuple[str, str]]:
+        # (author email, author date) of the commit that created the file, None when it has no history
+        path = strip_current_directory(file_path)
+        if path not in self.creations:
+            self.pending.add(path)
+            self.resolve()
+
+        return self.creations[path]
+
+    def resolve(self):
+        paths = self.pending - self.creations.keys()
+        self.pending = set()
+        if not paths:
+            return
+
+        try:
+            creations = self.find_creations({path: path for path in paths}, self.revision)
+        except subprocess.CalledProcessError as e:
+            logging.error(f"Couldn't determine provenance of {sorted(paths)}", e)
+            creations = {}
+
+        for path in paths:
+            creation = creations.get(path)
+            self.creations[path] = creation[:2] if creation else None
+
+    def find_creations(self, names: Dict[str, str], revision: str) -> Dict[str, Tuple[str, str, str]]:
+        # names maps each file to the name it had at revision; returns file -> (author, date, commit)
+        oldest = {}
+        renamed = {}
+        rename_sources = {}
+
+        merged = find_merged_paths(set(names.values()), revision)
+        for file, name in names.items():
+            if name in merged:
+                creation = find_creation_following(name, revision)
+                if creation:
+                    oldest[file] = creation
+        active = {file: name for file, name in names.items() if name not in merged}
+        if not active:
+            return oldest
+
+        for commit, author, date, changes in iter_commits_touching(set(active.values()), revision):
+            for status, path in changes:
+                for file, name in list(active.items()):
+                    if name != path:
+                        continue
+
+                    oldest[file] = (author, date, commit)
+                    if status != "A":
+                        continue
+
+                    if commit not in rename_sources:
+                        rename_sources[commit] = {}
+                    if path not in rename_sources[commit]:
+                        rename_sources[commit][path] = find_rename_source(commit, path)
+                    source = rename_sources[commit][path]
+                    if source is not None:
+                        # `git log --follow` carries on with the old name from here on
+                        renamed[file] = (source, commit)
+                        del active[file]
+
+        for file, (source, commit) in renamed.items():
+            earlier = self.find_creations({file: source}, f"{commit}^")
+            if file in earlier:
+                oldest[file] = earlier[file]
+
+        return oldest
@@ -0,0 +1,116 @@
+import logging
+import sqlite3
+import threading
+import uuid
+from time import time
+from typing import Any, Callable, Iterable, List, Optional, Set
+
+STATUS_PENDING = "pending"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+
+
+def pop_resume_argument(argv: List[str]) -> Optional[str]:
+    # takes `--resume <run-id>` out of argv, so the positional org and repo arguments keep their indices
+    if "--resume" not in argv:
+        return None
+
+    index = argv.index("--resume")
+    if index + 1 >= len(argv):
+        raise ValueError("--resume needs the id of the run to resume")
+
+    run_id = argv[index + 1]
+    del argv[index:index + 2]
+    return run_id
+
+
+# Records which repos a run has finished, so a run that died part way can be resumed with the same timestamp
+# instead of starting over. Every status change is its own committed statement, so whatever was recorded
+# before the process died is what a resumed run sees.
+class RunJournal:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.run_id = None
+        # repos are marked pending from the pool's task feeding thread and finished from the main thread
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            "run_id TEXT PRIMARY KEY, script TEXT NOT NULL, timestamp TEXT NOT NULL, "
+            "started REAL NOT NULL, finished REAL)"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS run_repos ("
+            "run_id TEXT NOT NULL, repo_id TEXT NOT NULL, status TEXT NOT NULL, updated REAL NOT NULL, "
+            "PRIMARY KEY (run_id, repo_id))"
+        )
+
+    def start_run(self, script: str, timestamp: str) -> str:
+        self.run_id = uuid.uuid4().hex
+        with self.lock:
+            self.connection.execute(
+                "INSERT INTO runs (run_id, script, timestamp, started) VALUES (?, ?, ?, ?)",
+                (self.run_id, script, timestamp, time()),
+            )
+        logging.info(f"Started run {self.run_id}, resume it with --resume {self.run_id}")
+        return self.run_id
+
+    def resume_run(self, run_id: str, script: str) -> str:
+        # returns the timestamp the run was started with
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT script, timestamp, finished FROM runs WHERE run_id = ?", (run_id,)
+            ).fetchone()
+        if row is None:
+            raise ValueError(f"No run {run_id} in {self.path}")
+        run_script, timestamp, finished = row
+        if run_script != script:
+            raise ValueError(f"Run {run_id} was started by {run_script}, not {script}")
+        if finished is not None:
+            logging.warning(f"Run {run_id} already finished, only repos it did not complete will be processed")
+
+        self.run_id = run_id
+        logging.info(f"Resuming run {run_id} with timestamp {timestamp}, {self.count(STATUS_COMPLETED)} repos done")
+        return timestamp
+
+    def completed_repos(self) -> Set[str]:
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT repo_id FROM run_repos WHERE run_id = ? AND status = ?", (self.run_id, STATUS_COMPLETED)
+            ).fetchall()
+        return {repo_id for repo_id, in rows}
+
+    def count(self, status: str) -> int:
+        with self.lock:
+            return self.connection.execute(
+                "SELECT COUNT(*) FROM run_repos WHERE run_id = ? AND status = ?", (self.run_id, status)
+            ).fetchone()[0]
+
+    def iter_unfinished(self, repos: Iterable, get_repo_id: Callable[[Any], str]):
+        # skips repos this run already completed and marks the rest pending as they are handed out
+        completed = self.completed_repos()
+        for repo in repos:
+            repo_id = get_repo_id(repo)
+            if repo_id in completed:
+                logging.debug(f"Skipping {repo_id}, already completed in run {self.run_id}")
+                continue
+            self.mark(repo_id, STATUS_PENDING)
+            yield repo
+
+    def mark(self, repo_id: str, status: str):
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO run_repos VALUES (?, ?, ?, ?)", (self.run_id, repo_id, status, time())
+            )
+
+    def finish_run(self):
+        with self.lock:
+            self.connection.execute("UPDATE runs SET finished = ? WHERE run_id = ?", (time(), self.run_id))
+        logging.info(
+            f"Finished run {self.run_id}: {self.count(STATUS_COMPLETED)} repos completed, "
+            f"{self.count(STATUS_FAILED)} failed"
+        )
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,110 @@
+from typing import Iterable, Iterator, List, Tuple
+
+
+def round_robin(iterables: List[Iterable]) -> Iterator:
+    # takes one item from each iterable in turn, so a long iterable cannot hold back the ones after it.
+    # iterables are only advanced when their turn comes, which keeps lazily paged listings lazy
+    iterators = [iter(iterable) for iterable in iterables]
+    while iterators:
+        remaining = []
+        for iterator in iterators:
+            try:
+                yield next(iterator)
+            except StopIteration:
+                continue
+            remaining.append(iterator)
+        iterators = remaining
+
+
+# rough cost of a repo whose hash has not changed: listing it, the vertex lookup and the repository upsert
+unchanged_repo_seconds = 1.0
+default_seconds_per_kb = 0.0005
+default_base_seconds = 10.0
+
+
+def fit_scan_cost(candidates: List[dict]) -> Tuple[float, float]:
+    # least-squares line of scan duration against size over every repo that has both,
+    # giving the fixed cost of a scan and its cost per KB
+    sized = [(candidate["size"], candidate["duration"]) for candidate in candidates
+             if candidate["duration"] and candidate["size"]]
+    if len(sized) < 2:
+        return default_base_seconds, default_seconds_per_kb
+
+    mean_size = sum(size for size, _ in sized) / len(sized)
+    mean_duration = sum(duration for _, duration in sized) / len(sized)
+    variance = sum((size - mean_size) ** 2 for size, _ in sized)
+    if variance == 0:
+        return default_base_seconds, default_seconds_per_kb
+
+    seconds_per_kb = sum((size - mean_size) * (duration - mean_duration) for size, duration in sized) / variance
+    seconds_per_kb = max(seconds_per_kb, 0.0)
+    base_seconds = max(mean_duration - seconds_per_kb * mean_size, 0.0)
+    return base_seconds, seconds_per_kb
+
+
+def estimate_scan_seconds(candidate: dict, base_seconds: float, seconds_per_kb: float) -> float:
+    if candidate["duration"]:
+        return candidate["duration"]
+
+    return base_seconds + (candidate["size"] or 0) * seconds_per_kb
+
+
+def estimate_duration(costs: List[float], processes: int) -> float:
+    # work is handed to whichever worker frees up first, in queue order
+    workers = [0.0] * processes
+    for cost in costs:
+        workers[workers.index(min(workers))] += cost
+
+    return max(workers) if workers else 0.0
+
+
+def build_scan_plan(candidates: List[dict], processes: int, budget_seconds: float, force: bool) -> dict:
+    # candidates carry "repo", "name", "size" (KB), "changed" and "duration" (last scan in seconds, or None).
+    # Changed repos are always scanned (forced when the run is) and go first, largest first. Unchanged repos are
+    # rescanned only when forcing, largest first, for as long as the budget (worker-seconds across all processes)
+    # allows; the rest are only checked for changes.
+    base_seconds, seconds_per_kb = fit_scan_cost(candidates)
+    for candidate in candidates:
+        candidate["estimated_seconds"] = estimate_scan_seconds(candidate, base_seconds, seconds_per_kb)
+
+    changed = sorted(
+        [candidate for candidate in candidates if candidate["changed"]],
+        key=lambda candidate: candidate["estimated_seconds"], reverse=True,
+    )
+    unchanged = sorted(
+        [candidate for candidate in candidates if not candidate["changed"]],
+        key=lambda candidate: candidate["estimated_seconds"], reverse=True,
+    )
+
+    capacity = budget_seconds * processes if budget_seconds else float("inf")
+    used = sum(candidate["estimated_seconds"] for candidate in changed) + unchanged_repo_seconds * len(unchanged)
+
+    rescans = []
+    checks = []
+    for candidate in unchanged:
+        extra = candidate["estimated_seconds"] - unchanged_repo_seconds
+        if force and used + extra <= capacity:
+            used += extra
+            rescans.append(candidate)
+        else:
+            checks.append(candidate)
+
+    entries = (
+        [dict(candidate, action="scan", force=force) for candidate in changed]
+        + [dict(candidate, action="scan", force=True) for candidate in rescans]
+        + [dict(candidate, action="check", force=False, estimated_seconds=unchanged_repo_seconds) for candidate in checks]
+    )
+    estimated_duration = estimate_duration([entry["estimated_seconds"] for entry in entries], processes)
+
+    return {
+        "processes": processes,
+        "budgetSeconds": budget_seconds,
+        "baseSeconds": base_seconds,
+        "secondsPerKb": seconds_per_kb,
+        "estimatedDurationSeconds": estimated_duration,
+        "fitsBudget": not budget_seconds or estimated_duration <= budget_seconds,
+        "changedRepos": len(changed),
+        "forcedRescans": len(rescans),
+        "deferredRescans": len(checks) if force else 0,
+        "entries": entries,
+    }
@@ -0,0 +1,196 @@
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from time import sleep, time
+
+# finished checkouts are moved here and deleted by the reapers
+trash_directory_name = "trash"
+index_file_name = "index.sqlite"
+
+STATE_WAITING = "waiting"
+STATE_ADMITTED = "admitted"
+# moved to the trash, until a reaper has deleted it
+STATE_DISCARDED = "discarded"
+
+
+def is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# Working directories for checkouts below a root of their own, which may be a tmpfs or a dedicated volume. Every
+# pool worker opens its own WorkspaceManager on the same root. Clones take a ticket and are admitted in ticket order,
+# each once its estimated size, added to that of every checkout not yet deleted, fits in the budget; the
+# reservations live in a shared SQLite index. A finished checkout is renamed into the trash directory, which is
+# instant, and deleted by a reaper thread (see WorkspaceReaper) while the worker goes on with its next repo. Its
+# bytes count against the budget until then. Reservations of a worker that died are given up by the next worker
+# to look at the queue.
+class WorkspaceManager:
+    def __init__(self, path: str, budget_bytes: int, poll_seconds: float = 1.0) -> None:
+        self.path = path
+        self.trash_path = os.path.join(path, trash_directory_name)
+        self.budget_bytes = budget_bytes
+        self.poll_seconds = poll_seconds
+        os.makedirs(self.trash_path, exist_ok=True)
+
+        self.index = sqlite3.connect(os.path.join(path, index_file_name), timeout=60, isolation_level=None)
+        self.index.execute("PRAGMA journal_mode=WAL")
+        self.index.execute(
+            "CREATE TABLE IF NOT EXISTS reservations ("
+            "ticket INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE, size INTEGER NOT NULL, "
+            "pid INTEGER NOT NULL, state TEXT NOT NULL)"
+        )
+
+    @contextmanager
+    def workspace(self, estimated_bytes: int):
+        # waits for estimated_bytes to fit in the budget, then yields a new empty directory as the current one
+        name = uuid.uuid4().hex
+        self.admit(name, estimated_bytes)
+        workspace_path = os.path.join(self.path, name)
+        try:
+            os.makedirs(workspace_path)
+            os.chdir(workspace_path)
+            yield workspace_path
+        finally:
+            os.chdir(self.path)
+            with self.index:
+                self.index.execute("BEGIN IMMEDIATE")
+                self.discard(name)
+
+    def admit(self, name: str, estimated_bytes: int):
+        with self.index:
+            self.index.execute("BEGIN IMMEDIATE")
+            self.index.execute(
+                "INSERT INTO reservations (name, size, pid, state) VALUES (?, ?, ?, ?)",
+                (name, estimated_bytes, os.getpid(), STATE_WAITING),
+            )
+
+        start_time = time()
+        logged = False
+        try:
+            while not self.try_admit(name):
+                if not logged:
+                    logging.info(
+                        f"Waiting for {estimated_bytes} bytes of the {self.budget_bytes} byte workspace budget"
+                    )
+                    logged = True
+                sleep(self.poll_seconds)
+        except BaseException:
+            self.index.execute("DELETE FROM reservations WHERE name = ?", (name,))
+            raise
+        if logged:
+            logging.info(f"Admitted a {estimated_bytes} byte checkout after {time() - start_time} seconds")
+
+    def try_admit(self, name: str) -> bool:
+        with self.index:
+            self.index.execute("BEGIN IMMEDIATE")
+            self.release_dead()
+            # first come, first served: a large checkout is not overtaken by smaller ones that would fit sooner
+            head = self.index.execute(
+                "SELECT name, size FROM reservations WHERE state = ? ORDER BY ticket LIMIT 1", (STATE_WAITING,)
+            ).fetchone()
+            if head is None or head[0] != name:
+                return False
+
+            reserved, count = self.index.execute(
+                "SELECT COALESCE(SUM(size), 0), COUNT(*) FROM reservations WHERE state != ?", (STATE_WAITING,)
+            ).fetchone()
+            # a checkout larger than the whole budget still gets its turn, alone
+            if count and reserved + head[1] > self.budget_bytes:
+                return False
+            self.index.execute("UPDATE reservations SET state = ? WHERE name = ?", (STATE_ADMITTED, name))
+            return True
+
+    def discard(self, name: str):
+        # in a transaction
+        try:
+            os.rename(os.path.join(self.path, name), os.path.join(self.trash_path, name))
+        except FileNotFoundError:
+            # never created, nothing to delete
+            self.index.execute("DELETE FROM reservations WHERE name = ?", (name,))
+            return
+        self.index.execute("UPDATE reservations SET state = ? WHERE name = ?", (STATE_DISCARDED, name))
+
+    def release_dead(self):
+        # in a transaction: gives up the reservations of workers that died holding them, e.g. killed for running
+        # out of memory mid-scan
+        rows = self.index.execute(
+            "SELECT name, pid, state FROM reservations WHERE state != ?", (STATE_DISCARDED,)
+        ).fetchall()
+        for name, pid, state in rows:
+            if is_alive(pid):
+                continue
+            logging.info(f"Releasing the {state} workspace {name} of process {pid}, which has exited")
+            if state == STATE_WAITING:
+                self.index.execute("DELETE FROM reservations WHERE name = ?", (name,))
+            else:
+                self.discard(name)
+
+    def reap(self) -> int:
+        # deletes every checkout in the trash and gives its bytes back to the budget, returns how many it deleted.
+        # Reapers of several workers may delete the same checkout at once, a reservation goes only once the whole
+        # directory is gone
+        with self.index:
+            self.index.execute("BEGIN IMMEDIATE")
+            self.release_dead()
+
+        reaped = 0
+        for name in os.listdir(self.trash_path):
+            trash_path = os.path.join(self.trash_path, name)
+            shutil.rmtree(trash_path, ignore_errors=True)
+            if not os.path.exists(trash_path):
+                self.index.execute("DELETE FROM reservations WHERE name = ?", (name,))
+                reaped += 1
+        return reaped
+
+    def reset(self):
+        # for the main process before any worker starts: whatever a previous run left behind is deleted on the spot
+        for name in os.listdir(self.path):
+            if name != trash_directory_name and not name.startswith(index_file_name):
+                os.rename(os.path.join(self.path, name), os.path.join(self.trash_path, name))
+        self.reap()
+        with self.index:
+            self.index.execute("BEGIN IMMEDIATE")
+            self.index.execute("DELETE FROM reservations")
+
+    def close(self):
+        self.index.close()
+
+
+# Empties a workspace root's trash in the background. Each pool worker runs one, so checkouts keep being deleted
+# when the worker that discarded them has exited after its maxtasksperchild tasks.
+class WorkspaceReaper(threading.Thread):
+    def __init__(self, path: str, budget_bytes: int, poll_seconds: float = 1.0) -> None:
+        super().__init__(name="workspace-reaper", daemon=True)
+        self.path = path
+        self.budget_bytes = budget_bytes
+        self.poll_seconds = poll_seconds
+        self.stopped = threading.Event()
+
+    def run(self):
+        # sqlite connections belong to the thread that opened them
+        manager = WorkspaceManager(self.path, self.budget_bytes, self.poll_seconds)
+        try:
+            while not self.stopped.is_set():
+                try:
+                    reaped = manager.reap()
+                except Exception as e:
+                    logging.exception("Failed to delete discarded workspaces", e)
+                    reaped = 0
+                if not reaped:
+                    self.stopped.wait(self.poll_seconds)
+        finally:
+            manager.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()